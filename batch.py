@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+from contextlib import nullcontext
+from main import main
+from utils.api import SupplierResolver
+from utils.client import ApiClient
+from utils.logger import setup_logging
+from utils.output import ProductOutput
+from utils.store import DEFAULT_STORE_FILE, ProductStore
+from utils.supplier_cache import SupplierCache
+
+DEFAULT_SPEC_FILE = "queries.jsonl"
+
+
+def load_specs(spec_file):
+    """Чтение заданий из JSONL: одна строка - {"query": ..., "max_products": ..., "output": ...}.
+
+    max_products и output необязательны; без output товары запроса попадают только в общий файл.
+    """
+    specs = []
+    with open(spec_file, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise Exception(f"Ошибка в строке {line_number} файла {spec_file}: {str(e)}")
+            if not spec.get("query"):
+                raise Exception(f"В строке {line_number} файла {spec_file} не указан query")
+            specs.append({
+                "query": spec["query"],
+                "max_products": int(spec.get("max_products", 1000)),
+                "output": spec.get("output"),
+            })
+    return specs
+
+
+async def run_batch(spec_file=DEFAULT_SPEC_FILE, combined_output=None, max_concurrent=4, sort_by="brand", chunk_size=50000, checkpoint=False, resume=False, delta=False, report_file=None, summary=False, store_file=None):
+    """Пакетный запуск запросов из spec_file.
+
+    Все запросы используют один клиент (общие лимиты запросов к хостам),
+    один кэш и один SupplierResolver, поэтому каждый продавец запрашивается
+    один раз за весь пакет. Одновременно выполняется не больше max_concurrent запросов.
+    combined_output - общий файл с товарами всех запросов без повторов артикулов;
+    summary=True добавляет к нему сводку по брендам и продавцам.
+    checkpoint=True ведет контрольные точки запросов, resume=True продолжает прерванные запросы с них,
+    delta=True включает дельта-обход.
+    report_file - JSON-отчет с метриками всего пакета.
+    store_file - локальное хранилище товаров (ProductStore), общее для всех запросов.
+    Возвращает список (query, ошибка или None).
+    """
+    specs = load_specs(spec_file)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    combined = ProductOutput(combined_output, sort_by=sort_by, chunk_size=chunk_size, dedup=True, summary=summary) if combined_output else None
+
+    async with ApiClient() as client:
+        with SupplierCache() as supplier_cache, ProductStore(store_file) if store_file else nullcontext() as store:
+            resolver = SupplierResolver(client, supplier_cache)
+
+            async def run_one(spec):
+                async with semaphore:
+                    print(f"Запрос: {spec['query']}")
+                    try:
+                        await main(
+                            spec["query"], spec["output"], spec["max_products"], client=client,
+                            supplier_cache=supplier_cache, sort_by=sort_by, chunk_size=chunk_size,
+                            resolver=resolver, on_products=combined.add if combined else None, checkpoint=checkpoint, resume=resume, delta=delta,
+                            store=store,
+                        )
+                        return spec["query"], None
+                    except Exception as e:
+                        print(f"Ошибка запроса {spec['query']}: {str(e)}")
+                        return spec["query"], e
+
+            try:
+                results = await asyncio.gather(*(run_one(spec) for spec in specs))
+                if combined:
+                    combined.close(await resolver.results())
+                    combined = None
+            finally:
+                resolver.cancel()
+                if combined:
+                    combined.abort()
+                if report_file:
+                    client.metrics.save_report(report_file)
+
+    failed = sum(1 for _, error in results if error)
+    print(f"Выполнено запросов: {len(results) - failed}, с ошибкой: {failed}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетный сбор товаров по запросам из JSONL")
+    parser.add_argument("spec_file", nargs="?", default=DEFAULT_SPEC_FILE)
+    parser.add_argument("--combined", help="Общий файл с товарами всех запросов (xlsx, parquet, csv.gz, jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Сколько запросов выполнять одновременно")
+    parser.add_argument("--checkpoint", action="store_true", help="Сохранять контрольные точки запросов для продолжения с --resume")
+    parser.add_argument("--resume", action="store_true", help="Продолжить прерванные запросы с контрольных точек")
+    parser.add_argument("--delta", action="store_true", help="Обходить только изменившиеся бренды и записать наборы изменений")
+    parser.add_argument("--report", help="Файл JSON-отчета с метриками пакета")
+    parser.add_argument("--summary", action="store_true", help="Добавить к общему файлу сводку по брендам и продавцам")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_FILE, help="Записать товары в локальное хранилище SQLite (по умолчанию products.sqlite)")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(run_batch(args.spec_file, args.combined, args.concurrency, checkpoint=args.checkpoint, resume=args.resume, delta=args.delta, report_file=args.report, summary=args.summary, store_file=args.store))
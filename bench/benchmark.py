@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+import aiohttp
+
+# Корень репозитория - чтобы запуск python bench/benchmark.py находил пакеты bench и utils
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.mock_server import SCENARIOS, WB_HOSTS, MockServer
+from main import main
+from utils.api import SupplierResolver, discover_catalog, get_all_products, get_brand_facets
+from utils.client import ApiClient
+from utils.excel_creator import ExcelStreamWriter
+from utils.scheduler import HostLimits, RequestScheduler
+from utils.supplier_cache import SupplierCache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Каталог с результатами по умолчанию
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+QUERY = "бенчмарк"
+
+
+def peak_rss_mb():
+    """Пиковый объем резидентной памяти процесса в МБ (None, если недоступно)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На Linux ru_maxrss в килобайтах, на macOS - в байтах
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RequestRecorder:
+    """Замер задержек HTTP-запросов (до получения заголовков ответа) через aiohttp.TraceConfig."""
+
+    def __init__(self):
+        self.latencies = []
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self._start)
+        self.trace_config.on_request_end.append(self._end)
+
+    async def _start(self, session, context, params):
+        context.start = time.perf_counter()
+
+    async def _end(self, session, context, params):
+        self.latencies.append(time.perf_counter() - context.start)
+
+
+async def measure(server, recorder, coro):
+    """Выполнение фазы с замером времени, запросов к стенду, задержек и памяти.
+
+    coro возвращает словарь счетчиков фазы ({"products": n} и т.п.); для каждого
+    счетчика добавляется скорость <имя>_per_s.
+    """
+    requests_before = server.stats["requests"]
+    latencies_from = len(recorder.latencies)
+    start = time.perf_counter()
+    counts = await coro
+    duration = time.perf_counter() - start
+    latencies = recorder.latencies[latencies_from:]
+    requests = server.stats["requests"] - requests_before
+    result = {
+        "duration_s": round(duration, 3),
+        "requests": requests,
+        "requests_per_s": round(requests / duration, 1) if duration else None,
+    }
+    for name, value in (counts or {}).items():
+        result[name] = value
+        result[f"{name}_per_s"] = round(value / duration, 1) if duration else None
+    result["latency_ms"] = {
+        name: round(percentile(latencies, q) * 1000, 1) if latencies else None
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+    }
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+async def run_benchmark(scenario="small", max_products=5000, host_rate=None):
+    """Прогон фаз парсера на локальном стенде; возвращает отчет (словарь).
+
+    Фазы: filters (фасет брендов), discover (обход каталога), products (get_all_products),
+    suppliers (продавцы по найденным товарам), excel (запись xlsx) и main (весь запуск).
+    host_rate - лимит запросов в секунду к каждому хосту вместо лимитов по умолчанию,
+    чтобы мерить сам парсер, а не ограничитель.
+    """
+    config = SCENARIOS[scenario]
+    recorder = RequestRecorder()
+    host_limits = None
+    if host_rate:
+        host_limits = {host: HostLimits(rate=host_rate, burst=max(1, int(host_rate / 2)), max_concurrency=64) for host in WB_HOSTS}
+
+    async with MockServer(config) as server:
+        def make_client():
+            return ApiClient(
+                scheduler=RequestScheduler(host_limits),
+                host_overrides=server.host_overrides,
+                trace_configs=[recorder.trace_config],
+            )
+
+        phases = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            async with make_client() as client:
+                async def filters():
+                    return {"brands": len(await get_brand_facets(QUERY, client))}
+
+                async def discover():
+                    _, products, _ = await discover_catalog(QUERY, client)
+                    return {"products": len(products)}
+
+                products = []
+
+                async def crawl():
+                    products.extend(await get_all_products(QUERY, max_products, client=client))
+                    return {"products": len(products)}
+
+                supplier_data = []
+
+                async def suppliers():
+                    resolver = SupplierResolver(client, SupplierCache(path=None))
+                    resolver.submit_products(products)
+                    supplier_data.extend(await resolver.results())
+                    return {"suppliers": len(supplier_data)}
+
+                async def excel():
+                    writer = ExcelStreamWriter(os.path.join(tmp_dir, "excel.xlsx"), supplier_data)
+                    writer.write(products)
+                    writer.close()
+                    return {"rows": writer.rows}
+
+                phases["filters"] = await measure(server, recorder, filters())
+                phases["discover"] = await measure(server, recorder, discover())
+                phases["products"] = await measure(server, recorder, crawl())
+                phases["suppliers"] = await measure(server, recorder, suppliers())
+                phases["excel"] = await measure(server, recorder, excel())
+
+            async def full_run():
+                count = 0
+
+                def on_products(batch):
+                    nonlocal count
+                    count += len(batch)
+
+                async with make_client() as client:
+                    await main(
+                        QUERY, os.path.join(tmp_dir, "main.xlsx"), max_products, client=client,
+                        supplier_cache=SupplierCache(path=None), on_products=on_products,
+                    )
+                return {"products": count}
+
+            phases["main"] = await measure(server, recorder, full_run())
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenario": scenario,
+        "config": asdict(config),
+        "catalog_products": len(server.products),
+        "max_products": max_products,
+        "host_rate": host_rate,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "phases": phases,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def save_report(report, output=None):
+    """Сохранение отчета в JSON; по умолчанию в bench/results/<время>_<сценарий>.json."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = report["timestamp"].replace(":", "").replace("-", "")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['scenario']}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def compare(baseline, report):
+    """Печать сравнения длительности фаз с прошлым отчетом."""
+    for name, phase in report["phases"].items():
+        old = baseline.get("phases", {}).get(name)
+        if not old or not old.get("duration_s"):
+            print(f"{name:10} {phase['duration_s']:>9.3f} с")
+            continue
+        ratio = phase["duration_s"] / old["duration_s"]
+        print(f"{name:10} {old['duration_s']:>9.3f} с -> {phase['duration_s']:>9.3f} с  (x{ratio:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк парсера на локальном стенде Wildberries")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="small")
+    parser.add_argument("--max-products", type=int, default=5000)
+    parser.add_argument("--host-rate", type=float, help="Лимит запросов в секунду к хосту вместо лимитов по умолчанию")
+    parser.add_argument("--output", help="Файл отчета JSON")
+    parser.add_argument("--compare", help="Отчет JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+    report = asyncio.run(run_benchmark(args.scenario, args.max_products, args.host_rate))
+    path = save_report(report, args.output)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    else:
+        compare({}, report)
+    print(f"Отчет сохранен: {path}")
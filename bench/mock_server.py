@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from aiohttp import web
+
+# Хосты Wildberries, которые подменяет стенд
+WB_HOSTS = ("search.wb.ru", "static-basket-01.wb.ru", "card.wb.ru")
+
+
+@dataclass
+class MockConfig:
+    """Параметры локального стенда Wildberries."""
+    brands: int = 40
+    min_products_per_brand: int = 1
+    max_products_per_brand: int = 400
+    suppliers: int = 200
+    catalog_depth: int = 100  # Сколько страниц отдает поиск без fbrand (ограничение глубины WB)
+    latency_ms: float = 20.0  # Медиана задержки ответа
+    latency_sigma: float = 0.5  # Разброс логнормального распределения задержки
+    error_rate: float = 0.0  # Доля ответов 500/503
+    rate_limit: float = 0.0  # Запросов в секунду до ответов 429; 0 - без ограничения
+    burst: int = 50
+    seed: int = 1
+
+
+# Готовые сценарии для бенчмарка
+SCENARIOS = {
+    "small": MockConfig(brands=20, max_products_per_brand=150),
+    "large": MockConfig(brands=300, max_products_per_brand=2000, suppliers=2000),
+    "slow": MockConfig(latency_ms=150.0, latency_sigma=0.8),
+    "flaky": MockConfig(error_rate=0.05),
+    "throttled": MockConfig(rate_limit=100.0, burst=20),
+}
+
+
+class MockServer:
+    """Локальный стенд трех эндпоинтов Wildberries, которые вызывает utils/api.py.
+
+    - /exactmatch/ru/common/v13/search: resultset=filters (фасет брендов) и resultset=catalog
+      с постраничной выдачей по 100 товаров, в том числе с фильтром fbrand;
+    - /vol0/data/supplier-by-id/{id}.json: данные продавца;
+    - /cards/v2/detail: цены и остатки по артикулам (nm) в регионе dest; цена зависит
+      от региона, а часть товаров в регионе недоступна.
+    Каталог генерируется детерминированно по seed. Задержка ответа логнормальная,
+    часть ответов может быть ошибками, а превышение rate_limit дает 429 с Retry-After.
+    Счетчики запросов и статусов доступны в stats (и по /stats).
+    """
+
+    def __init__(self, config=None):
+        self.config = config or MockConfig()
+        self.stats = Counter()
+        self._random = random.Random(self.config.seed)
+        self._generate()
+        self._tokens = float(self.config.burst)
+        self._updated = time.monotonic()
+        self._runner = None
+        self.base_url = None
+
+    def _generate(self):
+        config = self.config
+        rnd = random.Random(config.seed)
+        self.products = []
+        self.by_brand = {}
+        article = 100000
+        for brand_id in range(1, config.brands + 1):
+            items = []
+            for _ in range(rnd.randint(config.min_products_per_brand, config.max_products_per_brand)):
+                article += 1
+                supplier_id = rnd.randint(1, config.suppliers)
+                basic = rnd.randint(100, 100000) * 100
+                items.append({
+                    "id": article,
+                    "name": f"Товар {article}",
+                    "brand": f"Бренд {brand_id}",
+                    "brandId": brand_id,
+                    "supplier": f"Продавец {supplier_id}",
+                    "supplierId": supplier_id,
+                    "supplierRating": round(rnd.uniform(3, 5), 1),
+                    "feedbacks": rnd.randint(0, 5000),
+                    "reviewRating": round(rnd.uniform(3, 5), 1),
+                    "sizes": [{"price": {"basic": basic, "product": basic * 8 // 10, "total": basic * 9 // 10}}],
+                })
+            self.by_brand[brand_id] = items
+            self.products.extend(items)
+        self.by_article = {item["id"]: item for item in self.products}
+        # Выдача поиска без фильтра перемешивает бренды, как сортировка по популярности
+        rnd.shuffle(self.products)
+
+    def _throttled(self):
+        if not self.config.rate_limit:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.config.burst, self._tokens + (now - self._updated) * self.config.rate_limit)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return False
+        return True
+
+    async def _respond(self, endpoint, handler):
+        """Общая обработка: задержка, 429 и ошибки, затем ответ handler()."""
+        self.stats["requests"] += 1
+        self.stats[endpoint] += 1
+        if self._throttled():
+            self.stats["429"] += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        delay = self._random.lognormvariate(math.log(self.config.latency_ms / 1000), self.config.latency_sigma)
+        await asyncio.sleep(delay)
+        if self._random.random() < self.config.error_rate:
+            status = self._random.choice((500, 503))
+            self.stats[str(status)] += 1
+            return web.Response(status=status)
+        self.stats["200"] += 1
+        return web.json_response(handler())
+
+    async def search(self, request):
+        query = request.query
+        if query.get("resultset") == "filters":
+            def filters():
+                items = [
+                    {"id": brand_id, "name": f"Бренд {brand_id}", "count": len(products)}
+                    for brand_id, products in self.by_brand.items()
+                ]
+                return {"data": {"total": len(self.products), "filters": [{"key": "fbrand", "name": "Бренд", "items": items}]}}
+            return await self._respond("filters", filters)
+
+        def catalog():
+            page = int(query.get("page", 1))
+            if "fbrand" in query:
+                items = self.by_brand.get(int(query["fbrand"]), [])
+            else:
+                items = self.products if page <= self.config.catalog_depth else []
+            return {"data": {"total": len(items), "products": items[(page - 1) * 100:page * 100]}}
+        return await self._respond("catalog", catalog)
+
+    async def supplier(self, request):
+        supplier_id = int(request.match_info["supplier_id"])
+
+        def supplier():
+            return {
+                "supplierId": supplier_id,
+                "supplierName": f"Продавец {supplier_id}",
+                "supplierFullName": f"ООО Продавец {supplier_id}",
+                "inn": str(7700000000 + supplier_id),
+                "ogrn": str(1027700000000 + supplier_id),
+                "legalAddress": "г. Москва",
+                "trademark": f"Марка {supplier_id}",
+            }
+        return await self._respond("supplier", supplier)
+
+    async def cards(self, request):
+        dest = abs(int(request.query.get("dest", 0)))
+        articles = [int(nm) for nm in request.query.get("nm", "").split(";") if nm]
+
+        def cards():
+            products = []
+            for article in articles:
+                item = self.by_article.get(article)
+                # Каждый 13-й товар недоступен в регионе
+                if item is None or article % 13 == dest % 13:
+                    continue
+                factor = 100 + dest % 11  # Региональная наценка в процентах
+                price = {name: value * factor // 100 for name, value in item["sizes"][0]["price"].items()}
+                quantity = (article * 31 + dest) % 50
+                products.append({"id": article, "totalQuantity": quantity, "sizes": [{"price": price, "stocks": [{"qty": quantity}]}]})
+            return {"data": {"products": products}}
+        return await self._respond("cards", cards)
+
+    async def stats_handler(self, request):
+        return web.json_response(dict(self.stats))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/exactmatch/ru/common/v13/search", self.search)
+        app.router.add_get("/vol0/data/supplier-by-id/{supplier_id:\\d+}.json", self.supplier)
+        app.router.add_get("/cards/v2/detail", self.cards)
+        app.router.add_get("/stats", self.stats_handler)
+        return app
+
+    @property
+    def host_overrides(self):
+        """Подмена хостов для ApiClient(host_overrides=...)."""
+        return {host: self.base_url for host in WB_HOSTS}
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Запуск в текущем цикле событий; port=0 - любой свободный порт."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный стенд эндпоинтов Wildberries")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="small")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    server = MockServer(SCENARIOS[args.scenario])
+    print(f"Стенд: {len(server.products)} товаров, {server.config.brands} брендов, порт {args.port}")
+    web.run_app(server.app(), port=args.port, print=None, access_log=None)
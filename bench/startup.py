@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет времени запуска в миллисекундах (медиана, вместе со стартом интерпретатора)
+BUDGETS_MS = {
+    "python": None,  # Голый интерпретатор - точка отсчета
+    "cli --help": 150,
+    "import main": 600,  # Почти все время - aiohttp, без которого не уйдет первый запрос
+}
+
+# Модули, которых не должно быть после импорта консольного пути
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "PyQt5", "tqdm")
+
+COMMANDS = {
+    "python": [sys.executable, "-c", "pass"],
+    "cli --help": [sys.executable, "cli.py", "--help"],
+    "import main": [sys.executable, "-c", "import main"],
+}
+
+
+def measure(command, runs):
+    """Медиана времени выполнения команды в свежем процессе, мс."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 1)
+
+
+def heavy_imports(module):
+    """Какие из HEAVY_MODULES загружает импорт module."""
+    code = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def check_startup(runs=5):
+    """Замер запуска и сравнение с BUDGETS_MS; возвращает (отчет, нарушения)."""
+    report = {"timings_ms": {}, "heavy_imports": {}}
+    violations = []
+    for name, command in COMMANDS.items():
+        elapsed = measure(command, runs)
+        report["timings_ms"][name] = elapsed
+        budget = BUDGETS_MS.get(name)
+        if budget is not None and elapsed > budget:
+            violations.append(f"{name}: {elapsed} мс при бюджете {budget} мс")
+    for module in ("cli", "main"):
+        loaded = heavy_imports(module)
+        report["heavy_imports"][module] = loaded
+        if loaded:
+            violations.append(f"import {module} загружает {', '.join(loaded)}")
+    return report, violations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени запуска консольного парсера")
+    parser.add_argument("--runs", type=int, default=5, help="Сколько раз запускать каждую команду")
+    parser.add_argument("--output", help="Файл отчета JSON")
+    args = parser.parse_args()
+    report, violations = check_startup(args.runs)
+    for name, elapsed in report["timings_ms"].items():
+        budget = BUDGETS_MS.get(name)
+        print(f"{name:12} {elapsed:>8.1f} мс" + (f"  (бюджет {budget} мс)" if budget else ""))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for violation in violations:
+        print(f"Превышение: {violation}")
+    sys.exit(1 if violations else 0)
@@ -0,0 +1,118 @@
+"""Консольный запуск парсера без графического интерфейса (cron, серверы).
+
+На уровне модуля импортируется только стандартная библиотека: aiohttp и модули
+парсера загружаются после разбора аргументов, openpyxl - только при записи xlsx,
+numpy и pandas - только с --summary, tqdm - только с --progress, а PyQt5 не нужен
+вовсе. Поэтому --help и ошибки в аргументах отвечают сразу (бюджет времени
+запуска - bench/startup.py).
+"""
+import argparse
+import sys
+
+FORMATS = ("xlsx", "parquet", "csv", "jsonl")
+
+
+class ConsoleProgress:
+    """Прогресс-бар tqdm в консоли с интерфейсом progress_handler (update, set_total)."""
+
+    def __init__(self):
+        from tqdm import tqdm
+
+        self.bar = tqdm(unit="шт")
+
+    def update(self, n=1):
+        self.bar.update(n)
+
+    def set_total(self, total):
+        self.bar.reset(total=total)
+
+    def close(self):
+        self.bar.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Сбор товаров Wildberries по поисковому запросу")
+    parser.add_argument("query", nargs="?", default="латунный кран")
+    parser.add_argument("-n", "--max-products", type=int, default=100)
+    parser.add_argument("-o", "--output", default="wildberries_products.xlsx", help="Файл результата (xlsx, parquet, csv.gz, jsonl)")
+    parser.add_argument("-f", "--format", choices=FORMATS, help="Формат результата (по умолчанию по расширению --output)")
+    parser.add_argument("-c", "--concurrency", type=int, help="Не больше стольких одновременных запросов к каждому хосту")
+    parser.add_argument("--dest", type=int, help="Регион доставки (параметр dest) для обхода каталога")
+    parser.add_argument("--regions", help="Регионы для цен и остатков: dest или метка=dest через запятую (--regions=метка=dest,...)")
+    parser.add_argument("--sort-by", default="brand", help="Поле сортировки результата; none - порядок получения")
+    parser.add_argument("--summary", action="store_true", help="Добавить сводку по брендам и продавцам (нужны numpy и pandas)")
+    parser.add_argument("--store", nargs="?", const="products.sqlite", help="Записать товары в локальное хранилище SQLite (по умолчанию products.sqlite)")
+    parser.add_argument("--progress", action="store_true", help="Показывать прогресс-бар в консоли")
+    parser.add_argument("--checkpoint", action="store_true", help="Сохранять контрольную точку, чтобы прерванный сбор можно было продолжить")
+    parser.add_argument("--resume", action="store_true", help="Продолжить прерванный сбор с контрольной точки (запуска с --checkpoint)")
+    parser.add_argument("--delta", action="store_true", help="Обходить только изменившиеся бренды и записать набор изменений")
+    parser.add_argument("--report", help="Файл JSON-отчета с метриками запуска")
+    parser.add_argument("--prometheus", help="Файл метрик в текстовом формате Prometheus")
+    return parser
+
+
+async def run(args):
+    """Запуск main с клиентом, ограниченным --concurrency, в регионе --dest."""
+    # Тяжелые модули (aiohttp и парсер) загружаются только здесь
+    from contextlib import nullcontext
+    from main import main
+    from utils.client import DEFAULT_DEST, ApiClient
+    from utils.scheduler import RequestScheduler
+    from utils.store import ProductStore
+
+    progress = ConsoleProgress() if args.progress else None
+    try:
+        scheduler = RequestScheduler(max_concurrency=args.concurrency)
+        dest = DEFAULT_DEST if args.dest is None else args.dest
+        async with ApiClient(scheduler=scheduler, dest=dest) as client:
+            with ProductStore(args.store) if args.store else nullcontext() as store:
+                await main(
+                    args.query, args.output, args.max_products, progress, client,
+                    sort_by=args.sort_by, output_format=args.format, checkpoint=args.checkpoint, resume=args.resume, delta=args.delta,
+                    report_file=args.report, prometheus_file=args.prometheus, summary=args.summary,
+                    regions=args.regions, store=store,
+                )
+    finally:
+        if progress:
+            progress.close()
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.concurrency is not None and args.concurrency < 1:
+        print("--concurrency должно быть не меньше 1")
+        return 2
+    if args.sort_by.lower() == "none":
+        args.sort_by = None
+    else:
+        from utils.records import PRODUCT_FIELD_NAMES
+
+        if args.sort_by not in PRODUCT_FIELD_NAMES:
+            print(f"--sort-by: неизвестное поле {args.sort_by}; допустимо none или одно из: {', '.join(PRODUCT_FIELD_NAMES)}")
+            return 2
+    if args.regions:
+        from utils.regions import parse_regions
+
+        try:
+            args.regions = parse_regions(args.regions)
+        except ValueError as e:
+            print(str(e))
+            return 2
+
+    import asyncio
+    from utils.logger import setup_logging
+
+    setup_logging()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Парсинг прерван; продолжить можно с --resume" if args.checkpoint or args.resume else "Парсинг прерван")
+        return 130
+    except Exception as e:
+        print(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
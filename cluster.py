@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+from utils.api import SupplierResolver, get_brand_facets, get_brand_ids, get_products_by_brand
+from utils.client import ApiClient
+from utils.logger import setup_logging
+from utils.output import ProductOutput
+from utils.planner import plan_crawl
+from utils.scheduler import RequestScheduler
+from utils.supplier_cache import SupplierCache
+from utils.workqueue import DEFAULT_QUEUE_FILE, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+
+async def work(queue_file=DEFAULT_QUEUE_FILE, units_in_flight=4, share=1.0, wait=False, poll=1.0, page_window=4):
+    """Воркер: забирает блоки (бренды) из очереди и записывает собранные товары.
+
+    Одновременно обрабатывается до units_in_flight блоков. share - доля лимитов
+    запросов к хостам, если с этого адреса работают несколько воркеров.
+    Без wait воркер завершается, когда в очереди не остается открытых заданий.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+
+    async def run_unit(queue, client, unit):
+        unit_id, query, brand_id, quota, pages = unit
+        try:
+            products = await get_products_by_brand(query, brand_id, quota, None, client, None, set(), pages, page_window)
+            # Запись в очередь может ждать блокировку базы до timeout секунд - в отдельном потоке
+            await asyncio.to_thread(queue.complete, unit_id, products)
+        except Exception as e:
+            logger.error(f"Ошибка блока {unit_id} (бренд {brand_id}): {str(e)}")
+            try:
+                await asyncio.to_thread(queue.fail, unit_id, e)
+            except sqlite3.Error as error:
+                # Блок вернется в очередь по истечении аренды
+                logger.warning(f"Блок {unit_id} не возвращен в очередь: {str(error)}")
+            return 0
+        return 1
+
+    with WorkQueue(queue_file) as queue:
+        async with ApiClient(scheduler=RequestScheduler(share=share)) as client:
+            tasks = set()
+            while True:
+                unit = None
+                if len(tasks) < units_in_flight:
+                    try:
+                        unit = await asyncio.to_thread(queue.claim, worker)
+                    except sqlite3.OperationalError as e:
+                        # База занята дольше timeout - пробуем снова после ожидания
+                        logger.warning(f"Очередь недоступна: {str(e)}")
+                if unit is not None:
+                    tasks.add(asyncio.ensure_future(run_unit(queue, client, unit)))
+                    continue
+                if not tasks:
+                    if not wait and not await asyncio.to_thread(queue.has_open_jobs):
+                        break
+                    await asyncio.sleep(poll)
+                    continue
+                # Ждем освобождения места или появления новых блоков
+                finished, tasks = await asyncio.wait(tasks, timeout=poll, return_when=asyncio.FIRST_COMPLETED)
+                done += sum(task.result() for task in finished)
+    logger.info(f"Воркер {worker}: выполнено блоков {done}")
+    return done
+
+
+def run_worker(queue_file=DEFAULT_QUEUE_FILE, units_in_flight=4, share=1.0, wait=False):
+    """Точка входа процесса воркера (в том числе запущенного координатором через spawn)."""
+    setup_logging()
+    asyncio.run(work(queue_file, units_in_flight, share, wait))
+
+
+async def coordinate(query, output_file="wildberries_products.xlsx", max_products=1000, queue_file=DEFAULT_QUEUE_FILE, workers=None, units_in_flight=4, sort_by="brand", chunk_size=50000, output_format=None, policy="proportional", poll=1.0):
+    """Координатор: планирует обход брендов, раздает блоки воркерам и собирает результат.
+
+    workers - сколько локальных процессов-воркеров запустить (по умолчанию по числу ядер);
+    при workers=0 блоки обрабатывают только внешние воркеры, подключенные к queue_file.
+    Локальные воркеры делят между собой лимиты запросов к хостам.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    try:
+        async with ApiClient() as client:
+            facets = await get_brand_facets(query, client)
+            if facets:
+                units = [(plan.brand_id, plan.quota, plan.pages) for plan in plan_crawl(facets, max_products, policy)]
+            else:
+                units = [(brand_id, max_products, None) for brand_id in await get_brand_ids(query, client)]
+
+            with WorkQueue(queue_file) as queue:
+                job_id = queue.create_job(query, max_products, units)
+                logger.info(f"Задание {job_id}: блоков {len(units)}, воркеров {workers}")
+                context = multiprocessing.get_context("spawn")
+                processes = [
+                    context.Process(target=run_worker, args=(queue_file, units_in_flight, 1 / workers))
+                    for _ in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                try:
+                    while True:
+                        queue.expire()
+                        progress = queue.progress(job_id)
+                        if not progress["pending"] and not progress["claimed"]:
+                            break
+                        if processes and not any(process.is_alive() for process in processes):
+                            raise Exception(f"Воркеры завершились, не выполнив блоки: {progress}")
+                        await asyncio.sleep(poll)
+                finally:
+                    queue.close_job(job_id)
+                    for process in processes:
+                        process.join()
+                if progress["failed"]:
+                    logger.error(f"Не выполнено блоков: {progress['failed']}")
+
+                # Сборка результата из товаров, записанных воркерами
+                output = ProductOutput(output_file, output_format, sort_by, chunk_size)
+                with SupplierCache() as supplier_cache:
+                    resolver = SupplierResolver(client, supplier_cache)
+                    try:
+                        for products in queue.products(job_id, max_products):
+                            resolver.submit_products(products)
+                            output.add(products)
+                        supplier_data = await resolver.results()
+                    except BaseException:
+                        output.abort()
+                        raise
+                    finally:
+                        resolver.cancel()
+                output.close(supplier_data)
+
+    except Exception as e:
+        raise Exception(f"Ошибка координатора: {str(e)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Распределенный сбор товаров: координатор и воркеры с общей очередью SQLite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    coordinator_parser = subparsers.add_parser("coordinator", help="Спланировать задание, раздать блоки и собрать результат")
+    coordinator_parser.add_argument("query")
+    coordinator_parser.add_argument("--output", default="wildberries_products.xlsx")
+    coordinator_parser.add_argument("--max-products", type=int, default=1000)
+    coordinator_parser.add_argument("--workers", type=int, help="Число локальных воркеров (по умолчанию по числу ядер)")
+    coordinator_parser.add_argument("--queue", default=DEFAULT_QUEUE_FILE)
+    worker_parser = subparsers.add_parser("worker", help="Обрабатывать блоки из очереди")
+    worker_parser.add_argument("--queue", default=DEFAULT_QUEUE_FILE)
+    worker_parser.add_argument("--units", type=int, default=4, help="Сколько блоков обрабатывать одновременно")
+    worker_parser.add_argument("--wait", action="store_true", help="Ждать новых заданий вместо завершения")
+    args = parser.parse_args()
+    setup_logging()
+    if args.command == "coordinator":
+        asyncio.run(coordinate(args.query, args.output, args.max_products, args.queue, args.workers))
+    else:
+        run_worker(args.queue, args.units, wait=args.wait)
@@ -1,29 +1,85 @@
 import sys
 import asyncio
+import time
+from collections import deque
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QProgressBar
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QTimer
 from PyQt5 import QtGui
 from utils.api import get_total_products
+from utils.client import ApiClient
 from main import main
+from utils.logger import setup_logging
 import qasync
-from tqdm import tqdm
 
 class TqdmToProgressBar(QObject):
-    """Класс для перенаправления обновлений tqdm в QProgressBar."""
+    """Класс для перенаправления обновлений прогресса в QProgressBar.
+
+    update() только увеличивает счетчик; в интерфейс значение и статистика
+    (шт/с, запросов/с, оставшееся время) отправляются таймером раз в interval_ms,
+    поэтому частые обновления не заваливают поток интерфейса сигналами.
+    metrics - Metrics клиента, из которого берется число запросов.
+    """
     progress_updated = pyqtSignal(int)
     total_updated = pyqtSignal(int)
+    stats_updated = pyqtSignal(str)
 
-    def __init__(self, progress_bar):
+    def __init__(self, progress_bar, stats_label=None, metrics=None, interval_ms=100, rate_window=2.0):
         super().__init__()
         self.progress_bar = progress_bar
+        self.metrics = metrics
+        self.rate_window = rate_window  # За сколько секунд считать скорость
+        self.count = 0
+        self.total = 0
+        self._sent = None
+        self._samples = deque()  # (время, счетчик, запросов) для скользящей скорости
         self.progress_updated.connect(self.progress_bar.setValue)
         self.total_updated.connect(self.progress_bar.setMaximum)
+        if stats_label is not None:
+            self.stats_updated.connect(stats_label.setText)
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
 
     def update(self, n=1):
-        self.progress_updated.emit(self.progress_bar.value() + n)
+        self.count += n
 
     def set_total(self, total):
+        # Новая фаза (товары, затем продавцы) считается с нуля
+        self.total = total
+        self.count = 0
+        self._samples.clear()
         self.total_updated.emit(total)
+        self.flush()
+
+    def _requests(self):
+        return sum(self.metrics.requests.values()) if self.metrics else 0
+
+    def flush(self):
+        """Отправка накопленного значения и статистики в интерфейс."""
+        if self.count != self._sent:
+            self._sent = self.count
+            self.progress_updated.emit(min(self.count, self.total) if self.total else self.count)
+        now = time.monotonic()
+        requests = self._requests()
+        self._samples.append((now, self.count, requests))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.rate_window:
+            self._samples.popleft()
+        start, start_count, start_requests = self._samples[0]
+        elapsed = now - start
+        if elapsed <= 0:
+            return
+        rate = (self.count - start_count) / elapsed
+        request_rate = (requests - start_requests) / elapsed
+        eta = "--:--"
+        if rate > 0 and self.total > self.count:
+            minutes, seconds = divmod(int((self.total - self.count) / rate), 60)
+            eta = f"{minutes:02d}:{seconds:02d}"
+        self.stats_updated.emit(f"{rate:.0f} шт/с · {request_rate:.0f} запросов/с · осталось {eta}")
+
+    def stop(self):
+        self.timer.stop()
+        self.flush()
 
 class ParserApp(QMainWindow):
     def __init__(self):
@@ -32,7 +88,7 @@ class ParserApp(QMainWindow):
 
     def initUI(self):
         self.setWindowTitle("Парсер Wildberries")
-        self.setGeometry(100, 100, 450, 550)
+        self.setGeometry(100, 100, 450, 620)
         self.setStyleSheet("background-color: #f0f0f0;")
 
         # Основной виджет и layout
@@ -134,6 +190,15 @@ class ParserApp(QMainWindow):
         progress_layout.addStretch()
         main_layout.addLayout(progress_layout)
 
+        # Скорость и оставшееся время
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("font-size: 12px; color: #555;")
+        stats_layout = QHBoxLayout()
+        stats_layout.addStretch()
+        stats_layout.addWidget(self.stats_label)
+        stats_layout.addStretch()
+        main_layout.addLayout(stats_layout)
+
         # Кнопка для запуска парсинга
         self.parse_button = QPushButton("Начать парсинг")
         self.parse_button.setStyleSheet("""
@@ -159,6 +224,33 @@ class ParserApp(QMainWindow):
         self.parse_button.clicked.connect(self.start_parsing)
         main_layout.addLayout(parse_button_layout)
 
+        # Кнопка отмены парсинга
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.setStyleSheet("""
+            QPushButton {
+                font-size: 14px; 
+                padding: 8px; 
+                background-color: #6B7280; 
+                color: white; 
+                border: none; 
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #4B5563;
+            }
+            QPushButton:disabled {
+                background-color: #D1D5DB;
+            }
+        """)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_parsing)
+        cancel_button_layout = QHBoxLayout()
+        cancel_button_layout.addStretch()
+        cancel_button_layout.addWidget(self.cancel_button, 1)
+        cancel_button_layout.addStretch()
+        main_layout.addLayout(cancel_button_layout)
+        self.parse_task = None
+
         # Поле для статуса
         self.status_output = QTextEdit()
         self.status_output.setReadOnly(True)
@@ -192,16 +284,31 @@ class ParserApp(QMainWindow):
         finally:
             self.load_total_button.setEnabled(True)
 
-    async def run_parsing(self, query, max_products, output_file, progress_handler):
+    async def run_parsing(self, query, max_products, output_file):
         try:
-            await main(query, output_file, max_products, progress_handler)
+            async with ApiClient() as client:
+                progress_handler = TqdmToProgressBar(self.progress_bar, self.stats_label, client.metrics)
+                try:
+                    await main(query, output_file, max_products, progress_handler, client=client)
+                finally:
+                    progress_handler.stop()
             self.status_output.append(f"Парсинг завершен. Файл сохранен: {output_file}")
+        except asyncio.CancelledError:
+            self.status_output.append("Парсинг отменен")
         except Exception as e:
             self.status_output.append(f"Ошибка при парсинге: {str(e)}")
         finally:
             self.parse_button.setEnabled(True)
             self.load_total_button.setEnabled(True)
+            self.cancel_button.setEnabled(False)
             self.progress_bar.setValue(0)
+            self.stats_label.setText("")
+            self.parse_task = None
+
+    def cancel_parsing(self):
+        if self.parse_task is not None:
+            self.cancel_button.setEnabled(False)
+            self.parse_task.cancel()
 
     @qasync.asyncSlot()
     async def start_parsing(self):
@@ -221,10 +328,13 @@ class ParserApp(QMainWindow):
         self.parse_button.setEnabled(False)
         self.load_total_button.setEnabled(False)
         self.status_output.append("Парсинг начат...")
-        progress_handler = TqdmToProgressBar(self.progress_bar)
-        await self.run_parsing(query, max_products, output_file, progress_handler)
+        self.cancel_button.setEnabled(True)
+        # Отдельная задача, чтобы ее можно было отменить кнопкой
+        self.parse_task = asyncio.ensure_future(self.run_parsing(query, max_products, output_file))
+        await asyncio.wait({self.parse_task})
 
 if __name__ == "__main__":
+    setup_logging()
     app = QApplication(sys.argv)
     loop = qasync.QEventLoop(app)
     asyncio.set_event_loop(loop)
@@ -1,38 +1,137 @@
 import asyncio
-from tqdm import tqdm
-from utils.api import get_all_products, get_supplier_info
-from utils.excel_creator import save_to_excel
+import logging
+from array import array
+from contextlib import nullcontext
+from utils.api import SupplierResolver, iter_products
+from utils.checkpoint import CrawlCheckpoint, checkpoint_path
+from utils.client import ensure_client
+from utils.output import ProductOutput
+from utils.regions import RegionPrices
+from utils.snapshot import SnapshotStore, changes_path
+from utils.supplier_cache import SupplierCache
 
-async def main(query, output_file="wildberries_products.xlsx", max_products=1000, progress_handler=None):
-    """Основная функция парсера."""
+logger = logging.getLogger(__name__)
+
+async def main(query, output_file="wildberries_products.xlsx", max_products=1000, progress_handler=None, client=None, supplier_cache=None, sort_by="brand", chunk_size=50000, output_format=None, resolver=None, on_products=None, resume=False, delta=False, report_file=None, prometheus_file=None, summary=False, regions=None, store=None, checkpoint=False):
+    """Основная функция парсера.
+
+    supplier_cache - SupplierCache; по умолчанию открывается дисковый кэш продавцов.
+    Товары обрабатываются потоком: порции по chunk_size сбрасываются на диск,
+    поэтому память не растет с числом товаров. sort_by - поле сортировки
+    (внешняя сортировка слиянием) или None, чтобы сохранить порядок получения.
+    output_format - xlsx, parquet, csv (gzip) или jsonl; по умолчанию по расширению
+    output_file. Колоночные форматы без сортировки дописываются прямо во время сбора.
+    output_file=None - ничего не записывать (товары нужны только on_products).
+    resolver - общий SupplierResolver, если запусков несколько (пакетный режим).
+    checkpoint=True - ход сбора сохраняется в контрольную точку рядом с output_file
+    (см. checkpoint_path); при resume=True сбор продолжается с нее (и она ведется дальше),
+    иначе начинается заново. Без checkpoint и resume контрольная точка не пишется:
+    на больших сборах это заметная запись на диск. После успешной записи результата
+    контрольная точка удаляется.
+    delta=True - дельта-обход: бренды без изменений берутся из прошлого снимка запроса,
+    а рядом с output_file пишется набор изменений (см. changes_path). Контрольная точка
+    в этом режиме не ведется.
+    report_file и prometheus_file - куда записать метрики запуска (JSON и формат Prometheus).
+    summary=True - добавить к результату сводку по брендам и продавцам (см. ProductOutput).
+    regions - регионы доставки [(метка, dest)]: после сбора для всех товаров запрашиваются
+    цены и остатки в каждом регионе, и к результату добавляется широкая таблица (RegionPrices).
+    Каталог в любом случае обходится в регионе client.dest.
+    store - ProductStore: товары запуска пачками записываются в локальное хранилище
+    (последнее состояние товара и история цен) прямо во время сбора.
+    """
     try:
-        # Получение всех товаров с прогресс-баром
-        products = await get_all_products(query, max_products=max_products, progress_handler=progress_handler)
-    
-        # Сортировка по бренду
-        sorted_products = sorted(products, key=lambda x: x['brand'])
-    
-        # Получение уникальных ID продавцов
-        supplier_ids = sorted(set(product['supplierId'] for product in sorted_products if product['supplierId']))
-        
-        # Установка общего количества для прогресс-бара продавцов
-        if progress_handler:
-            progress_handler.set_total(len(supplier_ids))
-        
-        # Получение информации о продавцах асинхронно
-        supplier_data = await asyncio.gather(
-            *(get_supplier_info(supplier_id, progress_handler) for supplier_id in supplier_ids),
-            return_exceptions=True
-        )
-        # Фильтрация результатов, если были ошибки
-        supplier_data = [data for data in supplier_data if not isinstance(data, Exception)]
-    
-        # Сохранение результатов в Excel
-        save_to_excel(sorted_products, supplier_data, output_file)
+        # Один клиент с общим пулом соединений на весь запуск
+        async with ensure_client(client) as client:
+            with SupplierCache() if supplier_cache is None else nullcontext(supplier_cache) as supplier_cache, \
+                    SnapshotStore() if delta else nullcontext() as snapshot:
+                try:
+                    await _run(query, output_file, max_products, progress_handler, client, supplier_cache, sort_by, chunk_size, output_format, resolver, on_products, resume, checkpoint or resume, snapshot, summary, regions, store)
+                finally:
+                    # Метрики пишутся и после ошибки - по ним видно, где сбор споткнулся
+                    if report_file:
+                        client.metrics.save_report(report_file)
+                    if prometheus_file:
+                        client.metrics.save_prometheus(prometheus_file)
     
     except Exception as e:
         raise Exception(f"Ошибка в основной функции: {str(e)}")
 
-if __name__ == "__main__": 
-    query = "латунный кран"
-    asyncio.run(main(query, max_products=100))
\ No newline at end of file
+async def _run(query, output_file, max_products, progress_handler, client, supplier_cache, sort_by, chunk_size, output_format, resolver, on_products, resume, use_checkpoint, snapshot, summary, regions, store):
+    """Сбор товаров и продавцов с записью результата."""
+    output = ProductOutput(output_file, output_format, sort_by, chunk_size, summary=summary) if output_file else None
+    checkpoint = None
+    if use_checkpoint and output_file and not snapshot:
+        checkpoint = CrawlCheckpoint(checkpoint_path(output_file), query, max_products, resume, supplier_cache=supplier_cache, dest=client.dest)
+    # Продавцы запрашиваются по мере появления новых supplierId, параллельно со сбором товаров
+    own_resolver = resolver is None
+    if own_resolver:
+        resolver = SupplierResolver(client, supplier_cache)
+    supplier_ids = set()
+    region_prices = RegionPrices(regions) if regions and output else None
+    articles = array("q")
+    region_task = None
+    run_id = await store.begin_run_async(query, client.dest) if store else None
+    try:
+        # Потоковое получение товаров с прогресс-баром
+        async for products in iter_products(query, max_products, progress_handler, client, on_products=resolver.submit_products, checkpoint=checkpoint, snapshot=snapshot):
+            supplier_ids.update(product.supplierId for product in products if product.supplierId)
+            if region_prices:
+                articles.extend(product.article for product in products)
+            if store:
+                await store.add_async(run_id, products)
+            if output:
+                output.add(products)
+            if on_products:
+                on_products(products)
+        if store:
+            await store.finish_run_async(run_id)
+
+        # Цены по регионам запрашиваются, пока дожидаемся продавцов
+        if region_prices:
+            region_task = asyncio.ensure_future(region_prices.fetch(articles, client))
+        # Дожидаемся продавцов, большая часть которых уже получена во время сбора товаров
+        with client.metrics.phase("suppliers"):
+            supplier_data = await resolver.results(progress_handler, supplier_ids)
+        if region_task:
+            with client.metrics.phase("regions"):
+                await region_task
+    except BaseException:
+        if region_task and not region_task.done():
+            region_task.cancel()
+        if output:
+            output.abort()
+        if store:
+            # Собранное остается в хранилище; запуск без finished_at считается незавершенным
+            store.flush()
+        if checkpoint:
+            # Сохраняем собранное, чтобы запуск можно было продолжить с resume=True
+            checkpoint.close()
+        raise
+    finally:
+        if own_resolver:
+            resolver.cancel()
+
+    # Сохранение результатов
+    if output:
+        # Запись файла блокирующая, поэтому выполняется в отдельном потоке, не останавливая цикл событий (GUI)
+        try:
+            with client.metrics.phase("export"):
+                await asyncio.to_thread(output.close, supplier_data, [region_prices] if region_prices else ())
+        except BaseException:
+            if checkpoint:
+                checkpoint.close()
+            raise
+    if checkpoint:
+        checkpoint.discard()
+    if snapshot:
+        if output_file:
+            changes_file = changes_path(output_file)
+            counts = snapshot.write_changes(changes_file)
+            logger.info(f"Создан файл изменений {changes_file}: новых {counts['new']}, удаленных {counts['removed']}, измененных {counts['changed']}")
+        snapshot.commit()
+
+if __name__ == "__main__":
+    # Аргументы командной строки разбирает cli.py
+    import sys
+    from cli import cli
+    sys.exit(cli())
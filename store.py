@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from utils.store import DEFAULT_STORE_FILE, HISTORY_FIELDS, ProductStore
+
+
+def parse_time(value):
+    """Дата или дата-время ISO (2024-05-01, 2024-05-01T12:00) в Unix time."""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Некорректная дата {value}: ожидается ГГГГ-ММ-ДД или ГГГГ-ММ-ДДTЧЧ:ММ")
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else ""
+
+
+def print_records(records, columns, as_json=False):
+    """Вывод записей таблицей с колонками columns или построчным JSON."""
+    if as_json:
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        return
+    if not records:
+        print("Ничего не найдено")
+        return
+    rows = [[format_time(record[column]) if column.endswith("_at") or column.endswith("_seen") else "" if record[column] is None else str(record[column]) for column in columns] for record in records]
+    widths = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск по локальному хранилищу товаров")
+    parser.add_argument("--store", default=DEFAULT_STORE_FILE, help="Файл хранилища")
+    parser.add_argument("--json", action="store_true", help="Вывод построчным JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    article_parser = subparsers.add_parser("article", help="Последнее состояние товара")
+    article_parser.add_argument("article", type=int)
+    history_parser = subparsers.add_parser("history", help="История цен товара по запускам")
+    history_parser.add_argument("article", type=int)
+    history_parser.add_argument("--since", type=parse_time, help="С даты (ГГГГ-ММ-ДД)")
+    history_parser.add_argument("--until", type=parse_time, help="До даты (ГГГГ-ММ-ДД, не включая)")
+    find_parser = subparsers.add_parser("find", help="Товары по бренду, продавцу и (или) запросу")
+    find_parser.add_argument("--brand")
+    find_parser.add_argument("--supplier", type=int, help="ID продавца")
+    find_parser.add_argument("--query", help="Поисковый запрос")
+    find_parser.add_argument("--limit", type=int, default=100)
+    runs_parser = subparsers.add_parser("runs", help="Последние запуски")
+    runs_parser.add_argument("--query")
+    runs_parser.add_argument("--limit", type=int, default=20)
+    subparsers.add_parser("stats", help="Размер хранилища")
+    args = parser.parse_args()
+
+    product_columns = ["article", "name", "brand", "price_basic", "price_product", "price_total", "feedbacks", "rating", "supplierId", "supplier"]
+    with ProductStore(args.store) as store:
+        if args.command == "article":
+            product = store.get(args.article)
+            if product is None:
+                print(f"Артикул {args.article} не найден")
+                sys.exit(1)
+            print_records([product], product_columns + ["first_seen", "last_seen", "runs"], args.json)
+        elif args.command == "history":
+            print_records(store.history(args.article, args.since, args.until), ["started_at", "query", "dest", *HISTORY_FIELDS], args.json)
+        elif args.command == "find":
+            if args.brand is None and args.supplier is None and args.query is None:
+                parser.error("укажите --brand, --supplier или --query")
+            print_records(store.find(args.brand, args.supplier, args.query, args.limit), product_columns, args.json)
+        elif args.command == "runs":
+            print_records(store.runs(args.query, args.limit), ["id", "query", "dest", "started_at", "finished_at", "products"], args.json)
+        else:
+            print_records([store.stats()], ["products", "observations", "runs"], args.json)
@@ -0,0 +1,124 @@
+import logging
+from utils.writers import sibling_path
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ("price_basic", "price_product", "price_total")
+_PRICE_TITLES = ("Обычная цена", "Цена по ВБ Карте", "Цена без ВБ Карты")
+_PRICE_STATS = (("min", "мин"), ("median", "медиана"), ("max", "макс"))
+
+# Колонки сводки: (поле, заголовок в Excel)
+SUMMARY_COLUMNS = (
+    [("products", "Товаров")]
+    + [
+        (f"{field}_{stat}", f"{title}, {stat_title}")
+        for field, title in zip(PRICE_FIELDS, _PRICE_TITLES)
+        for stat, stat_title in _PRICE_STATS
+    ]
+    + [("rating_mean", "Средний рейтинг"), ("feedbacks_total", "Всего отзывов")]
+)
+
+# Разрезы сводки: имя -> (колонки ключа в выгрузке, лист Excel)
+SUMMARY_GROUPS = {
+    "brands": ([("brand", "Бренд")], "Сводка по брендам"),
+    "suppliers": ([("supplierId", "ID продавца"), ("supplier", "Поставщик(продавец)")], "Сводка по продавцам"),
+}
+
+
+def _libraries():
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        raise Exception("Для сводки по брендам и продавцам установите пакеты numpy и pandas")
+    return np, pd
+
+
+class ProductSummary:
+    """Колоночная сводка по брендам и продавцам.
+
+    Порции товаров сразу переводятся в массивы numpy (бренд - целочисленный код,
+    продавец - supplierId), поэтому объекты Product не накапливаются. В tables()
+    колонки склеиваются, повторные артикулы отбрасываются, а агрегаты (число товаров,
+    минимум/медиана/максимум цен, средний рейтинг, сумма отзывов) считает groupby pandas.
+    numpy и pandas загружаются только при создании сводки.
+    """
+
+    def __init__(self):
+        self.np, self.pd = _libraries()
+        self._brands = {}  # Бренд -> код
+        self._suppliers = {}  # supplierId -> название продавца
+        self._chunks = []
+
+    def add(self, products):
+        """Добавление порции товаров (список Product)."""
+        if not products:
+            return
+        np = self.np
+        count = len(products)
+        brands = self._brands
+        chunk = {
+            "article": np.fromiter((p.article for p in products), np.int64, count),
+            "brand": np.fromiter((brands.setdefault(p.brand, len(brands)) for p in products), np.int32, count),
+            "supplierId": np.fromiter((p.supplierId or 0 for p in products), np.int64, count),
+            "rating": np.array([p.rating for p in products], dtype=np.float64),
+            "feedbacks": np.fromiter((p.feedbacks or 0 for p in products), np.int64, count),
+        }
+        for field in PRICE_FIELDS:
+            # None превращается в NaN и не участвует в агрегатах
+            chunk[field] = np.array([getattr(p, field) for p in products], dtype=np.float64)
+        self._suppliers.update(zip(chunk["supplierId"].tolist(), (p.supplier for p in products)))
+        self._chunks.append(chunk)
+
+    def frame(self):
+        """Все товары одной таблицей без повторных артикулов."""
+        np, pd = self.np, self.pd
+        if not self._chunks:
+            return pd.DataFrame(columns=["article", "brand", "supplierId", "rating", "feedbacks", *PRICE_FIELDS])
+        frame = pd.DataFrame({name: np.concatenate([chunk[name] for chunk in self._chunks]) for name in self._chunks[0]})
+        return frame.drop_duplicates("article", ignore_index=True)
+
+    def _aggregate(self, frame, key):
+        aggregations = {"products": ("article", "size")}
+        for field in PRICE_FIELDS:
+            for stat, _ in _PRICE_STATS:
+                aggregations[f"{field}_{stat}"] = (field, stat)
+        aggregations["rating_mean"] = ("rating", "mean")
+        aggregations["feedbacks_total"] = ("feedbacks", "sum")
+        table = frame.groupby(key, sort=False).agg(**aggregations)
+        table["rating_mean"] = table["rating_mean"].round(2)
+        return table.sort_values("products", ascending=False, kind="stable").reset_index()
+
+    def tables(self):
+        """Сводки {имя разреза: DataFrame} с колонками ключа и SUMMARY_COLUMNS."""
+        frame = self.frame()
+        brands = self._aggregate(frame, "brand")
+        brand_names = self.np.array(list(self._brands), dtype=object)
+        brands["brand"] = brand_names[brands["brand"].to_numpy()] if len(brands) else brands["brand"]
+        suppliers = self._aggregate(frame, "supplierId")
+        suppliers.insert(1, "supplier", suppliers["supplierId"].map(self._suppliers))
+        return {"brands": brands, "suppliers": suppliers}
+
+    def write(self, output_file, output_format, writer=None):
+        """Запись сводок: в Excel - отдельными листами книги writer (до ее сохранения),
+        в остальных форматах - соседними файлами products.brands_summary.<ext> и products.suppliers_summary.<ext>."""
+        tables = self.tables()
+        for name, table in tables.items():
+            key_columns, sheet_title = SUMMARY_GROUPS[name]
+            columns = key_columns + SUMMARY_COLUMNS
+            table = table[[field for field, _ in columns]]
+            if output_format == "xlsx":
+                # NaN (нет цен) в Excel записывается пустой ячейкой
+                rows = table.astype(object).where(table.notna(), None).itertuples(index=False, name=None)
+                writer.add_sheet(sheet_title, [title for _, title in columns], rows)
+                continue
+            path = sibling_path(output_file, f"{name}_summary")
+            if output_format == "parquet":
+                table.to_parquet(path, index=False)
+            elif output_format == "csv":
+                table.to_csv(path, index=False, compression="gzip")
+            elif output_format == "jsonl":
+                table.to_json(path, orient="records", lines=True, force_ascii=False)
+            else:
+                raise ValueError(f"Неизвестный формат вывода: {output_format}")
+        logger.info(f"Сводка: брендов {len(tables['brands'])}, продавцов {len(tables['suppliers'])}")
@@ -1,8 +1,22 @@
 import aiohttp
 import asyncio
-import json
+import inspect
+import logging
+import math
+import time
 from urllib.parse import quote
 import random
+from collections import deque
+from utils.budget import ProductBudget
+from utils.client import ensure_client
+from utils.json_codec import DECODE_ERRORS, decode
+from utils.planner import CATALOG_DEPTH_CAP, PAGE_SIZE, parse_brand_facets, plan_crawl
+from utils.records import Product
+from utils.retry import parse_retry_after
+from utils.snapshot import brand_fingerprint
+from utils.supplier_cache import SupplierCache
+
+logger = logging.getLogger(__name__)
 
 # Список User-Agent для ротации
 user_agents = [
@@ -12,6 +26,16 @@ user_agents = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
 ]
 
+class PageFetchError(Exception):
+    """Страница выдачи не получена после всех повторов (в отличие от пустой страницы - конца выдачи).
+
+    products - товары, собранные до этой страницы.
+    """
+
+    def __init__(self, message, products=()):
+        super().__init__(message)
+        self.products = products
+
 def get_headers():
     """Возвращает заголовки с случайным User-Agent."""
     return {
@@ -23,54 +47,160 @@ def get_headers():
         "Referer": "https://www.wildberries.ru/",
     }
 
-async def fetch_url(session, url):
-    """Асинхронное выполнение GET-запроса."""
-    try:
-        async with session.get(url, headers=get_headers(), timeout=10) as response:
-            if response.status != 200:
-                print(f"Status code: {response.status}")
-                return None
-            text = await response.text()
-            if not text:
-                print("Empty response")
-                return None
+async def fetch_url(client, url):
+    """Асинхронное выполнение GET-запроса через общий клиент и планировщик.
+
+    Временные ошибки (429, 5xx, таймауты, сетевые ошибки) повторяются по
+    client.retry_policy; None возвращается только после исчерпания попыток
+    или при постоянной ошибке.
+    """
+    policy = client.retry_policy
+    endpoint = _endpoint(url)
+    for attempt in range(policy.attempts):
+        status, body, retry_after = await _attempt(client, url, endpoint)
+        if body is not None:
             try:
-                data = json.loads(text)
-                return data
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError: {e} - Raw response: {text[:500]}")
+                return decode(body)
+            except DECODE_ERRORS as e:
+                logger.error(f"JSONDecodeError: {e} - Raw response: {body[:500].decode('utf-8', 'replace')}")
+                client.metrics.event("dropped", endpoint)
                 return None
+        if status == 200 or not policy.is_retryable(status):
+            client.metrics.event("dropped", endpoint)
+            return None
+        if attempt + 1 < policy.attempts:
+            client.metrics.event("retry", endpoint)
+            await asyncio.sleep(policy.backoff(attempt, retry_after))
+    logger.error(f"Попытки исчерпаны: {url}")
+    client.metrics.event("dropped", endpoint)
+    return None
+
+def _endpoint(url):
+    """Имя эндпоинта для метрик."""
+    if "supplier-by-id" in url:
+        return "supplier"
+    if "/cards/" in url:
+        return "card"
+    if "resultset=filters" in url:
+        return "filters"
+    if "fbrand=" in url:
+        return "brand_catalog"
+    return "catalog"
+
+async def _attempt(client, url, endpoint):
+    """Одна попытка запроса; при включенном хеджировании - с дублем после p95 задержки."""
+    policy = client.retry_policy
+    hedge_after = None
+    if policy.hedge:
+        hedge_after = client.latency_tracker(url).quantile(policy.hedge_quantile, policy.hedge_min_samples)
+    if hedge_after is None:
+        return await _request(client, url, endpoint)
+
+    sent = asyncio.Event()
+    first = asyncio.ensure_future(_request(client, url, endpoint, sent))
+    second = None
+    try:
+        # Отсчет p95 начинается с момента отправки, а не с ожидания слота планировщика
+        waiter = asyncio.ensure_future(sent.wait())
+        try:
+            await asyncio.wait({first, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        done, _ = await asyncio.wait({first}, timeout=max(hedge_after, policy.hedge_min_delay))
+        if done:
+            return first.result()
+        # Ответ задерживается дольше p95 - отправляем дубль и берем первый успешный ответ
+        client.metrics.event("hedge", endpoint)
+        second = asyncio.ensure_future(_request(client, url, endpoint, hedge=True))
+        pending = {first, second}
+        result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result[1] is not None:
+                    return result
+        return result
+    finally:
+        for task in (first, second):
+            if task is not None and not task.done():
+                task.cancel()
+
+async def _request(client, url, endpoint, sent=None, hedge=False):
+    """Запрос через слот планировщика: (статус, тело или None, Retry-After в секундах).
+
+    sent - событие, которое выставляется в момент отправки запроса; hedge - дублирующий запрос.
+    """
+    async with client.scheduler.slot(url, hedge) as slot:
+        if sent is not None:
+            sent.set()
+        start = time.monotonic()
+        status, body, retry_after = await _fetch_body(client, url)
+        slot.status = status
+    latency = time.monotonic() - start
+    client.metrics.observe_request(endpoint, status, latency, len(body) if body else 0)
+    if body is not None:
+        client.latency_tracker(url).add(latency)
+    return status, body, retry_after
+
+async def _fetch_body(client, url):
+    try:
+        async with client.session.get(client.resolve_url(url), headers=get_headers()) as response:
+            if response.status != 200:
+                logger.warning(f"Status code: {response.status}: {url}")
+                return response.status, None, parse_retry_after(response.headers.get("Retry-After"))
+            body = await response.read()
+            if not body:
+                logger.warning(f"Empty response: {url}")
+                return response.status, None, None
+            return response.status, body, None
     except aiohttp.ClientError as e:
-        print(f"ClientError: {e}")
-        return None
+        logger.warning(f"ClientError: {e}")
+        return None, None, None
+    except asyncio.TimeoutError:
+        logger.warning(f"Timeout: {url}")
+        return None, None, None
     except Exception as e:
-        print(f"Неизвестная ошибка при запросе {url}: {e}")
+        logger.error(f"Неизвестная ошибка при запросе {url}: {e}")
         raise
 
-async def get_total_products(query):
-    """Получение общего количества доступных товаров по запросу."""
+async def get_filters(query, client=None):
+    """Получение ответа resultset=filters (общее количество и фасеты) по запросу."""
     encoded_query = quote(query)
-    url = f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest=-1255987&hide_dtype=13&lang=ru&query={encoded_query}&resultset=filters&spp=30&suppressSpellcheck=false&uclusters=2"
-    async with aiohttp.ClientSession() as session:
-        data = await fetch_url(session, url)
-        if data and isinstance(data, dict) and "data" in data and isinstance(data["data"], dict) and "total" in data["data"]:
-            return data["data"]["total"]
-        elif data:
-            print(f"Unexpected data structure: {data}")
-        else:
-            print("No data returned from API")
-        return 0
+    async with ensure_client(client) as client:
+        url = f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest={client.dest}&hide_dtype=13&lang=ru&query={encoded_query}&resultset=filters&spp=30&suppressSpellcheck=false&uclusters=2"
+        return await fetch_url(client, url)
 
-async def get_brand_ids(query):
+async def get_total_products(query, client=None):
+    """Получение общего количества доступных товаров по запросу."""
+    data = await get_filters(query, client)
+    if data and isinstance(data, dict) and "data" in data and isinstance(data["data"], dict) and "total" in data["data"]:
+        return data["data"]["total"]
+    elif data:
+        logger.warning(f"Unexpected data structure: {data}")
+    else:
+        logger.warning("No data returned from API")
+    return 0
+
+async def get_brand_facets(query, client=None):
+    """Получение списка брендов с количеством товаров одним запросом: [(id, name, count)]."""
+    return parse_brand_facets(await get_filters(query, client))
+
+def _catalog_url(encoded_query, page, dest):
+    return f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest={dest}&hide_dtype=13&lang=ru&query={encoded_query}&resultset=catalog&sort=popular&spp=30&suppressSpellcheck=false&page={page}"
+
+def _brand_url(encoded_query, brand_id, page, dest):
+    return f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest={dest}&fbrand={brand_id}&hide_dtype=13&lang=ru&page={page}&q1={encoded_query}&query={encoded_query}&resultset=catalog&sort=popular&spp=30&suppressSpellcheck=false&uclusters=2&uiv=0&uv=AQIAAQIDAAoACcgxQ948xkLCQ1W8GUVxwoK6aDz-v2PEtbzJOeG4C7iXOzZBfcNyPkREqcHqQVfEw0Lgu2NAbMpZxOa4G8OiwbzIE0HSHSu-M85MM-wVG-JDWqxUlIRcLIQtY16L-tSC1FVL54RlNFQsFoR8BBCjoAQHs35LzkPZFBOjwVxKrCh7-GREVGTMYtRcVGXzuVSzi8_cXCLHzEUjblQGY4eEnPQhbBB8GuOs3EEDFnPXLCjr0jPLhF4r_suY851kE7xrvGgTFFvJlDRjcJRZJE0Mchxsk2Ux0qwHDA7sFBQZM4VEQ7vBxIBD35Ph9DCr56xITGQj2zOtzIgjQbNqk_28cTPWYxVS1VNqsxVTFV"
+
+async def get_brand_ids(query, client=None):
     """Получение всех brand ID из каталога товаров по запросу."""
     encoded_query = quote(query)
     brand_ids = set()
     page = 1
 
-    async with aiohttp.ClientSession() as session:
+    async with ensure_client(client) as client:
         while True:
-            url = f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest=-1255987&hide_dtype=13&lang=ru&query={encoded_query}&resultset=catalog&sort=popular&spp=30&suppressSpellcheck=false&page={page}"
-            data = await fetch_url(session, url)
+            data = await fetch_url(client, _catalog_url(encoded_query, page, client.dest))
             if not data or "data" not in data or "products" not in data["data"]:
                 break
             products = data["data"]["products"]
@@ -81,131 +211,547 @@ async def get_brand_ids(query):
                 if brand_id:
                     brand_ids.add(brand_id)
             page += 1
-            await asyncio.sleep(0.05)  # Уменьшенная задержка
     return list(brand_ids)
 
-async def get_products_by_brand(query, brand_id, max_products_per_brand, progress_handler=None):
-    """Получение товаров для конкретного brand ID."""
+async def discover_catalog(query, client=None, budget=None, progress_handler=None, seen=None, on_products=None, collect=True, checkpoint=None, page_window=4):
+    """Обход каталога по запросу со сбором brand ID и самих товаров за один проход.
+
+    Возвращает (brand_counts, products, complete): brand_counts - сколько товаров
+    каждого brand ID встретилось при обходе, complete=False означает, что обход уперся
+    в ограничение глубины поиска или в бюджет и часть каталога не получена.
+    При collect=False товары только передаются в on_products и не накапливаются.
+    checkpoint (CrawlCheckpoint) запоминает каждую страницу; обход продолжается с последней сохраненной.
+    Как и в get_products_by_brand, после первой страницы (когда известен total) до page_window
+    страниц запрашиваются одновременно, а разбираются в порядке страниц.
+    """
     encoded_query = quote(query)
-    base_url = f"https://search.wb.ru/exactmatch/ru/common/v13/search?ab_testing=false&appType=1&curr=rub&dest=-1581689&fbrand={brand_id}&hide_dtype=13&lang=ru&page=1&q1={encoded_query}&query={encoded_query}&resultset=catalog&sort=popular&spp=30&suppressSpellcheck=false&uclusters=2&uiv=0&uv=AQIAAQIDAAoACcgxQ948xkLCQ1W8GUVxwoK6aDz-v2PEtbzJOeG4C7iXOzZBfcNyPkREqcHqQVfEw0Lgu2NAbMpZxOa4G8OiwbzIE0HSHSu-M85MM-wVG-JDWqxUlIRcLIQtY16L-tSC1FVL54RlNFQsFoR8BBCjoAQHs35LzkPZFBOjwVxKrCh7-GREVGTMYtRcVGXzuVSzi8_cXCLHzEUjblQGY4eEnPQhbBB8GuOs3EEDFnPXLCjr0jPLhF4r_suY851kE7xrvGgTFFvJlDRjcJRZJE0Mchxsk2Ux0qwHDA7sFBQZM4VEQ7vBxIBD35Ph9DCr56xITGQj2zOtzIgjQbNqk_28cTPWYxVS1VNqsxVTFV"
+    brand_counts = {}
     products = []
-    page = 1
+    seen = set() if seen is None else seen
+    total = None
+    complete = False
+    next_page = 1
+    if checkpoint and checkpoint.discovery:
+        state = checkpoint.discovery
+        brand_counts, total = state["brand_counts"], state["total"]
+        if state["done"]:
+            return brand_counts, products, state["complete"]
+        next_page = state["page"] + 1
+    last_page = CATALOG_DEPTH_CAP
+    if total:
+        last_page = min(last_page, math.ceil(total / PAGE_SIZE))
+    # Окно упреждающих запросов: (страница, резерв, задача) в порядке страниц
+    pending = deque()
 
-    async with aiohttp.ClientSession(
-        connector=aiohttp.TCPConnector(limit=50)  # Увеличен лимит соединений
-    ) as session:
-        while len(products) < max_products_per_brand:
-            url = base_url.replace("page=1", f"page={page}")
-            data = await fetch_url(session, url)
-            if not data:
-                break
-            product_data = data.get("data", {}).get("products", [])
-            if not product_data:
-                break
-            for p in product_data:
-                if len(products) >= max_products_per_brand:
+    async with ensure_client(client) as client:
+        try:
+            while True:
+                # Пока total неизвестен, идем по одной странице
+                window = page_window if total else 1
+                while len(pending) < window and next_page <= last_page:
+                    if not budget:
+                        granted = PAGE_SIZE
+                    elif pending:
+                        # С незавершенными резервами ждать бюджет нельзя - это может заблокировать всех
+                        granted = budget.try_acquire(PAGE_SIZE)
+                    else:
+                        granted = await budget.acquire(PAGE_SIZE)
+                    if not granted:
+                        break
+                    url = _catalog_url(encoded_query, next_page, client.dest)
+                    pending.append((next_page, granted, asyncio.ensure_future(fetch_url(client, url))))
+                    next_page += 1
+                if not pending:
+                    if next_page <= last_page:
+                        # Бюджет исчерпан: обход можно продолжить при возобновлении
+                        return brand_counts, products, False
+                    # Получены все страницы до total (или до ограничения глубины поиска)
+                    complete = total is not None and len(seen) >= total
                     break
-                price = {
-                    "basic": None,
-                    "product": None,
-                    "total": None,
-                }
-                if p.get("price"):
-                    price_data = p.get("price", {})
-                    price = {
-                        "product": (
-                            price_data.get("product", 0) / 100
-                            if price_data.get("product")
-                            else None
-                        ),
-                    }
-                elif p.get("sizes"):
-                    for size in p.get("sizes", []):
-                        if size.get("price"):
-                            price_data = size["price"]
-                            price = {
-                                "basic": (
-                                    price_data.get("basic", 0) / 100
-                                    if price_data.get("basic")
-                                    else None
-                                ),
-                                "product": (
-                                    price_data.get("product", 0) / 100
-                                    if price_data.get("product")
-                                    else None
-                                ),
-                                "total": (
-                                    price_data.get("total", 0) / 100
-                                    if price_data.get("total")
-                                    else None
-                                ),
-                            }
-                            break
-                products.append(
-                    {
-                        "id": p["id"],
-                        "name": p["name"],
-                        "brand": p.get("brand", "Неизвестный бренд"),
-                        "url": f"https://www.wildberries.ru/catalog/{p['id']}/detail.aspx",
-                        "price": price,
-                        "article": p.get("id"),
-                        "feedbacks": p.get("feedbacks", 0),
-                        "rating": p.get("reviewRating", 0),
-                        "supplier": p.get("supplier", "Неизвестный продавец"),
-                        "supplierId": p.get("supplierId", 0),
-                        "supplierRating": p.get("supplierRating", 0),
-                    }
-                )
-                if progress_handler:
-                    progress_handler.update(1)
-            page += 1
-            await asyncio.sleep(0.05)  # Уменьшенная задержка
+
+                page, granted, task = pending.popleft()
+                parsed = []
+                try:
+                    data = await task
+                    if not data or "data" not in data or "products" not in data["data"]:
+                        # Страница не получена после повторов - обход не завершен, остальное соберет проход по брендам
+                        complete = False
+                        break
+                    page_products = data["data"]["products"]
+                    if not page_products:
+                        # Пустая страница: каталог кончился, если получены все товары из total
+                        complete = total is None or len(seen) >= total
+                        break
+                    if total is None and data["data"].get("total"):
+                        total = data["data"]["total"]
+                        last_page = min(last_page, math.ceil(total / PAGE_SIZE))
+                    if budget and len(page_products) > granted:
+                        # Резерв, полученный без ожидания, мог быть меньше страницы - добираем так же
+                        granted += budget.try_acquire(len(page_products) - granted)
+                    for product in page_products:
+                        brand_id = product.get("brandId")
+                        if brand_id:
+                            brand_counts[brand_id] = brand_counts.get(brand_id, 0) + 1
+                    parsed = _parse_page(page_products, progress_handler, seen, granted)
+                    if collect:
+                        products.extend(parsed)
+                    if checkpoint:
+                        checkpoint.save_discovery(page, brand_counts, total, parsed)
+                    await _emit(on_products, parsed)
+                finally:
+                    if budget:
+                        budget.commit(granted, len(parsed))
+        finally:
+            # Отменяем упреждающие запросы, которые больше не нужны
+            for _, granted, task in pending:
+                task.cancel()
+                if budget:
+                    budget.commit(granted, 0)
+            if pending:
+                await asyncio.gather(*(task for _, _, task in pending), return_exceptions=True)
+    if checkpoint:
+        checkpoint.save_discovery(CATALOG_DEPTH_CAP, brand_counts, total, [], done=True, complete=complete)
+    return brand_counts, products, complete
+
+async def get_products_by_brand(query, brand_id, max_products_per_brand, progress_handler=None, client=None, budget=None, seen=None, max_pages=None, page_window=4, on_products=None, collect=True, checkpoint=None, first_page=1):
+    """Получение товаров для конкретного brand ID.
+
+    Если передан общий budget, каждая страница запрашивается только после
+    резервирования под нее места в бюджете. Товары из набора seen пропускаются.
+    max_pages ограничивает число страниц, если оно известно заранее из плана.
+    Когда число страниц известно (из плана или из total первой страницы), до page_window
+    страниц запрашиваются одновременно; результат собирается в порядке страниц
+    и обрывается на первой пустой. Сколько товаров взять со страницы, решается при ее
+    разборе по уже собранному количеству, а не при постановке в окно. on_products вызывается для каждой разобранной страницы;
+    при collect=False товары не накапливаются в возвращаемом списке.
+    checkpoint (CrawlCheckpoint) запоминает каждую страницу; обход продолжается со следующей
+    после последней сохраненной, завершенные бренды пропускаются.
+    first_page - с какой страницы начинать, если предыдущие уже получены вызывающим кодом.
+    Страница, не полученная после всех повторов, дает PageFetchError: товары предыдущих
+    страниц уже переданы (и сохранены в checkpoint), а бренд не отмечается завершенным.
+    """
+    encoded_query = quote(query)
+    products = []
+    count = 0
+    # Окно упреждающих запросов: (страница, резерв, задача) в порядке страниц
+    pending = deque()
+    reserved = 0
+    next_page = first_page
+    last_page = min(max_pages or CATALOG_DEPTH_CAP, CATALOG_DEPTH_CAP)
+    pages_known = max_pages is not None
+    if checkpoint:
+        done_page, count, finished = checkpoint.brand_state(brand_id)
+        if finished:
+            return products
+        next_page = done_page + 1
+    done_page = next_page - 1
+
+    async with ensure_client(client) as client:
+        try:
+            while True:
+                # Пока число страниц неизвестно, идем по одной странице
+                window = page_window if pages_known else 1
+                blocked = False
+                while len(pending) < window and next_page <= last_page:
+                    wanted = min(PAGE_SIZE, max_products_per_brand - count - reserved)
+                    if wanted <= 0:
+                        break
+                    if not budget:
+                        granted = wanted
+                    elif pending:
+                        # С незавершенными резервами ждать бюджет нельзя - это может заблокировать всех
+                        granted = budget.try_acquire(wanted)
+                    else:
+                        granted = await budget.acquire(wanted)
+                    if not granted:
+                        blocked = True
+                        break
+                    url = _brand_url(encoded_query, brand_id, next_page, client.dest)
+                    pending.append((next_page, granted, asyncio.ensure_future(fetch_url(client, url))))
+                    reserved += granted
+                    next_page += 1
+                if not pending:
+                    break
+
+                done_page, granted, task = pending.popleft()
+                reserved -= granted
+                parsed = []
+                try:
+                    data = await task
+                    if data is None:
+                        # Страница не получена после всех повторов - это не конец выдачи бренда
+                        raise PageFetchError(f"Страница {done_page} бренда {brand_id} не получена", products)
+                    product_data = data.get("data", {}).get("products", [])
+                    if product_data:
+                        # Резерв выдан при постановке страницы в окно в расчете на полные предыдущие
+                        # страницы; если на них были уже собранные товары, лимит больше резерва -
+                        # считаем его по фактически собранному и добираем резерв без ожидания
+                        limit = max(0, min(len(product_data), max_products_per_brand - count))
+                        if limit > granted:
+                            granted += budget.try_acquire(limit - granted) if budget else limit - granted
+                        parsed = _parse_page(product_data, progress_handler, seen, min(granted, limit))
+                        count += len(parsed)
+                        if collect:
+                            products.extend(parsed)
+                        if checkpoint:
+                            checkpoint.save_brand_page(brand_id, done_page, count, parsed)
+                        await _emit(on_products, parsed)
+                finally:
+                    if budget:
+                        # Возвращаем в бюджет неиспользованный остаток резерва
+                        budget.commit(granted, len(parsed))
+                if not product_data:
+                    break
+                if not pages_known:
+                    total = data["data"].get("total")
+                    if total:
+                        last_page = min(last_page, math.ceil(total / PAGE_SIZE))
+                        pages_known = True
+            # Бренд, остановленный бюджетом, при возобновлении можно продолжить
+            if checkpoint and not blocked:
+                checkpoint.save_brand_page(brand_id, done_page, count, [], finished=True)
+        finally:
+            # Отменяем упреждающие запросы, которые больше не нужны
+            for _, granted, task in pending:
+                task.cancel()
+                if budget:
+                    budget.commit(granted, 0)
+            if pending:
+                await asyncio.gather(*(task for _, _, task in pending), return_exceptions=True)
     return products
 
-async def get_all_products(query, max_products, progress_handler=None):
-    """Асинхронное получение всех товаров по запросу через API для всех brand ID."""
-    brand_ids = await get_brand_ids(query)
-    if not brand_ids:
-        return []
+def _price(value):
+    """Цена из копеек в рубли; 0 и отсутствие цены - None."""
+    return value / 100 if value else None
 
-    all_products = []
+def parse_product(p):
+    """Преобразование товара из ответа каталога в Product."""
+    price_basic = price_product = price_total = None
+    if p.get("price"):
+        price_product = _price(p["price"].get("product"))
+    elif p.get("sizes"):
+        for size in p.get("sizes", []):
+            if size.get("price"):
+                price_data = size["price"]
+                price_basic = _price(price_data.get("basic"))
+                price_product = _price(price_data.get("product"))
+                price_total = _price(price_data.get("total"))
+                break
+    return Product(
+        article=p["id"],
+        name=p["name"],
+        brand=p.get("brand", "Неизвестный бренд"),
+        price_basic=price_basic,
+        price_product=price_product,
+        price_total=price_total,
+        feedbacks=p.get("feedbacks", 0),
+        rating=p.get("reviewRating", 0),
+        supplier=p.get("supplier", "Неизвестный продавец"),
+        supplierId=p.get("supplierId", 0),
+        supplierRating=p.get("supplierRating", 0),
+    )
+
+# Сколько артикулов запрашивается одним запросом карточек
+CARD_BATCH_SIZE = 100
+
+def _card_url(articles, dest):
+    nm = ";".join(str(article) for article in articles)
+    return f"https://card.wb.ru/cards/v2/detail?appType=1&curr=rub&dest={dest}&spp=30&nm={nm}"
+
+def parse_region_price(p):
+    """Цены и остаток товара из ответа карточек: (обычная цена, по ВБ Карте, без ВБ Карты, остаток)."""
+    price_basic = price_product = price_total = None
+    quantity = 0
+    for size in p.get("sizes", []):
+        price_data = size.get("price")
+        if price_data and price_product is None:
+            price_basic = _price(price_data.get("basic"))
+            price_product = _price(price_data.get("product"))
+            price_total = _price(price_data.get("total"))
+        quantity += sum(stock.get("qty", 0) for stock in size.get("stocks", []))
+    return price_basic, price_product, price_total, p.get("totalQuantity", quantity)
+
+async def get_region_prices(articles, dest, client=None):
+    """Цены и остатки товаров (не больше CARD_BATCH_SIZE артикулов) в регионе доставки dest.
+
+    Возвращает {артикул: parse_region_price(...)}; товаров, недоступных в регионе,
+    в ответе нет. None - запрос не удался.
+    """
+    async with ensure_client(client) as client:
+        data = await fetch_url(client, _card_url(articles, dest))
+    if data is None:
+        return None
+    return {p["id"]: parse_region_price(p) for p in data.get("data", {}).get("products", []) if "id" in p}
+
+async def _emit(on_products, products):
+    """Передача порции товаров обработчику; асинхронный обработчик ожидается (обратное давление)."""
+    if on_products and products:
+        result = on_products(products)
+        if inspect.isawaitable(result):
+            await result
+
+def _parse_page(product_data, progress_handler=None, seen=None, limit=None):
+    """Преобразование не более limit товаров одной страницы каталога.
+
+    Если передан набор seen, уже встречавшиеся ID пропускаются.
+    """
+    products = []
+    for p in product_data:
+        if limit is not None and len(products) >= limit:
+            break
+        if seen is not None:
+            if p["id"] in seen:
+                continue
+            seen.add(p["id"])
+        products.append(parse_product(p))
+        if progress_handler:
+            progress_handler.update(1)
+    return products
+
+async def get_all_products(query, max_products, progress_handler=None, client=None, harvest=True, policy="proportional", page_window=4, on_products=None, checkpoint=None, snapshot=None):
+    """Асинхронное получение всех товаров по запросу через API для всех brand ID.
+
+    При harvest=True товары собираются уже при обходе каталога, а проход по брендам
+    запускается только для той части, которую поиск не отдал (ограничение глубины).
+    Проход по брендам планируется по фасету брендов из resultset=filters: лимит
+    делится между брендами согласно policy, число страниц считается заранее.
+    page_window - сколько страниц одного бренда запрашивается одновременно.
+    on_products вызывается с каждой новой порцией товаров по мере их получения.
+    checkpoint (CrawlCheckpoint) периодически сохраняет ход сбора; если в нем уже есть
+    данные, собранные товары берутся из него, а обход продолжается с места остановки.
+    snapshot (SnapshotStore) включает дельта-обход относительно прошлого снимка запроса.
+    """
+    async with ensure_client(client) as client:
+        return await _collect_products(query, max_products, progress_handler, client, harvest, policy, page_window, on_products, checkpoint=checkpoint, snapshot=snapshot)
+
+async def iter_products(query, max_products, progress_handler=None, client=None, harvest=True, policy="proportional", page_window=4, on_products=None, queue_size=16, checkpoint=None, snapshot=None):
+    """Потоковое получение товаров: асинхронный генератор порций (страниц) товаров.
+
+    Товары не накапливаются в памяти: сбор приостанавливается, пока потребитель
+    не заберет очередные queue_size порций.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    done = object()
+
+    async def push(products):
+        await _emit(on_products, products)
+        await queue.put(products)
+
+    async def produce():
+        try:
+            await _collect_products(query, max_products, progress_handler, client, harvest, policy, page_window, push, collect=False, checkpoint=checkpoint, snapshot=snapshot)
+        except Exception as e:
+            # Ошибку сборщика передаем потребителю через очередь
+            await queue.put(e)
+        else:
+            await queue.put(done)
+
+    async with ensure_client(client) as client:
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                products = await queue.get()
+                if products is done:
+                    break
+                if isinstance(products, Exception):
+                    raise products
+                yield products
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+
+async def _collect_products(query, max_products, progress_handler, client, harvest, policy, page_window, on_products, collect=True, checkpoint=None, snapshot=None):
+    """Сбор товаров по всем брендам через общий клиент."""
     if progress_handler:
         progress_handler.set_total(max_products)
+    if snapshot:
+        return await _collect_delta(query, max_products, progress_handler, client, policy, page_window, on_products, collect, snapshot)
 
-    # Распараллеливаем запросы для всех brand_id
-    async def fetch_products_for_brand(brand_id):
-        return await get_products_by_brand(
-            query,
-            brand_id,
-            max_products - len(all_products),
-            progress_handler
-        )
+    seen = set()
+    harvested = {}
+    all_products = []
 
-    # Выполняем запросы параллельно
-    tasks = [fetch_products_for_brand(brand_id) for brand_id in brand_ids]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Товары из контрольной точки передаются дальше так же, как только что полученные
+    restored = 0
+    if checkpoint:
+        for products in checkpoint.restored_products():
+            seen.update(p.article for p in products)
+            restored += len(products)
+            if collect:
+                all_products.extend(products)
+            if progress_handler:
+                progress_handler.update(len(products))
+            await _emit(on_products, products)
 
+    # Общий бюджет товаров, из которого атомарно берут все бренды
+    budget = ProductBudget(max(max_products - restored, 0))
+    if budget.exhausted.is_set():
+        return all_products
+
+    with client.metrics.phase("discovery"):
+        if harvest:
+            harvested, products, complete = await discover_catalog(query, client, budget, progress_handler, seen, on_products, collect, checkpoint, page_window)
+            all_products.extend(products)
+            if complete or budget.exhausted.is_set():
+                return all_products
+
+        if checkpoint and checkpoint.jobs is not None:
+            # План обхода брендов уже был составлен до остановки
+            jobs = checkpoint.jobs
+        else:
+            jobs = await _plan_jobs(query, client, budget, harvested, max_products, policy)
+            if checkpoint:
+                checkpoint.save_jobs(jobs)
+    if not jobs:
+        return all_products
+
+    # Распараллеливаем запросы для всех brand_id; страницы запрашиваются только под резерв бюджета,
+    # поэтому после его исчерпания ожидающие бренды сразу завершаются без новых запросов
+    tasks = [
+        get_products_by_brand(query, brand_id, quota, progress_handler, client, budget, seen, pages, page_window, on_products, collect, checkpoint)
+        for brand_id, quota, pages in jobs
+    ]
+    with client.metrics.phase("crawl"):
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = 0
     for result in results:
-        if not isinstance(result, Exception):
+        if isinstance(result, Exception):
+            # Бренд собран не полностью: страница не получена (PageFetchError) или ошибка обхода
+            logger.error(f"Бренд собран не полностью: {result}")
+            failed += 1
+            if isinstance(result, PageFetchError):
+                all_products.extend(result.products)
+        else:
             all_products.extend(result)
-        if len(all_products) >= max_products:
-            break
+    if failed:
+        if checkpoint:
+            # Запуск завершается ошибкой, чтобы контрольная точка сохранилась и недостающие
+            # страницы можно было дособрать с resume=True
+            raise Exception(f"Не собрано брендов {failed} из {len(results)}; продолжить можно с resume")
+        logger.error(f"Результат неполный: не собрано брендов {failed} из {len(results)}")
 
     return all_products[:max_products]
 
-# Кэш для данных продавцов
-sellers_cache = {}
+async def _collect_delta(query, max_products, progress_handler, client, policy, page_window, on_products, collect, snapshot):
+    """Дельта-обход по брендам.
+
+    Для каждого бренда из плана запрашивается первая страница; если отпечаток бренда
+    (число товаров в фасете, квота и первая страница) совпал с прошлым снимком,
+    остальные страницы не запрашиваются, а товары берутся из снимка. Доля snapshot.sample_rate
+    неизменившихся брендов все равно обходится целиком, чтобы замечать изменения глубже первой страницы.
+    Все товары попадают в новый снимок (snapshot.stage). Бренд, у которого не получена любая
+    страница (первая или PageFetchError на следующих), переносится из прошлого снимка вместе
+    с отпечатком, чтобы его товары не попали в удаленные.
+    """
+    with client.metrics.phase("discovery"):
+        facets = await get_brand_facets(query, client)
+    if not facets:
+        raise Exception("Фасет брендов недоступен, дельта-обход невозможен")
+    snapshot.begin(query)
+    encoded_query = quote(query)
+    seen = set()
 
-async def get_supplier_info(supplier_id, progress_handler=None):
-    """Асинхронное получение информации о продавце по ID через новый API."""
-    if supplier_id in sellers_cache:
+    async def crawl_brand(plan):
+        products = []
+
+        async def emit(chunk):
+            snapshot.stage(plan.brand_id, chunk)
+            if collect:
+                products.extend(chunk)
+            await _emit(on_products, chunk)
+
+        async def restore():
+            """Товары бренда из прошлого снимка, кроме уже полученных."""
+            for chunk in snapshot.brand_products(plan.brand_id, plan.quota):
+                fresh = []
+                for product in chunk:
+                    if product.article not in seen:
+                        seen.add(product.article)
+                        fresh.append(product)
+                if progress_handler:
+                    progress_handler.update(len(fresh))
+                await emit(fresh)
+            return products
+
+        try:
+            data = await fetch_url(client, _brand_url(encoded_query, plan.brand_id, 1, client.dest))
+            if data is None:
+                raise Exception("первая страница не получена")
+            product_data = data.get("data", {}).get("products", [])
+            fingerprint = brand_fingerprint(plan.count, plan.quota, [parse_product(p) for p in product_data])
+            if snapshot.brand_unchanged(plan.brand_id, fingerprint) and random.random() >= snapshot.sample_rate:
+                return await restore()
+
+            await emit(_parse_page(product_data, progress_handler, seen, plan.quota))
+            if product_data and plan.pages > 1 and len(products) < plan.quota:
+                await get_products_by_brand(
+                    query, plan.brand_id, plan.quota - len(products), progress_handler, client, None, seen,
+                    plan.pages, page_window, emit, collect=False, first_page=2,
+                )
+            return products
+        except Exception as e:
+            logger.warning(f"Бренд {plan.brand_id} не получен ({e}), товары взяты из прошлого снимка")
+            snapshot.keep_brand(plan.brand_id)
+            return await restore()
+
+    tasks = [asyncio.ensure_future(crawl_brand(plan)) for plan in plan_crawl(facets, max_products, policy)]
+    with client.metrics.phase("crawl"):
+        try:
+            # Ошибка переноса бренда из снимка прерывает запуск: снимок без бренда записал бы его товары удаленными
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    all_products = []
+    for result in results:
+        all_products.extend(result)
+    return all_products
+
+async def _plan_jobs(query, client, budget, harvested, max_products, policy):
+    """План обхода брендов: [(brand_id, quota, pages)]."""
+    facets = await get_brand_facets(query, client)
+    if facets:
+        # Планируем только то, что еще не собрано при обходе каталога; обход мог встретить бренд чаще,
+        # чем указано в фасете, - такие и полностью собранные бренды в план не попадают
+        remaining = [(brand_id, name, max(0, count - harvested.get(brand_id, 0))) for brand_id, name, count in facets]
+        remaining = [facet for facet in remaining if facet[2] > 0]
+        plans = plan_crawl(remaining, budget.remaining, policy)
+        jobs = []
+        for plan in plans:
+            already = harvested.get(plan.brand_id, 0)
+            # Страницы считаются от начала бренда, поэтому учитываем уже собранные товары
+            pages = math.ceil((plan.quota + already) / PAGE_SIZE) if already else plan.pages
+            jobs.append((plan.brand_id, plan.quota, pages))
+    else:
+        # Фасеты недоступны - обходим бренды без плана
+        brand_ids = list(harvested) or await get_brand_ids(query, client)
+        jobs = [(brand_id, max_products, None) for brand_id in brand_ids]
+    return jobs
+
+# Кэш продавцов в памяти процесса, если вызывающий код не передал свой
+sellers_cache = SupplierCache(path=None)
+
+async def get_supplier_info(supplier_id, progress_handler=None, client=None, cache=None):
+    """Асинхронное получение информации о продавце по ID через новый API.
+
+    cache - SupplierCache; без него используется кэш в памяти процесса.
+    """
+    cache = cache or sellers_cache
+    supplier_data = cache.get(supplier_id)
+    if client is not None:
+        client.metrics.cache_lookup("supplier", supplier_data is not None)
+    if supplier_data is not None:
         if progress_handler:
             progress_handler.update(1)
-        return sellers_cache[supplier_id]
+        return supplier_data
 
     url = f"https://static-basket-01.wb.ru/vol0/data/supplier-by-id/{supplier_id}.json"
-    async with aiohttp.ClientSession() as session:
-        data = await fetch_url(session, url)
+    async with ensure_client(client) as client:
+        data = await fetch_url(client, url)
         if data:
             supplier_data = {
                 "supplierId": data.get("supplierId", supplier_id),
@@ -223,7 +769,7 @@ async def get_supplier_info(supplier_id, progress_handler=None):
                 "unn": data.get("unn", "Неизвестно"),
                 "supplierUrl": f"https://www.wildberries.ru/seller/{supplier_id}",
             }
-            sellers_cache[supplier_id] = supplier_data
+            cache.set(supplier_id, supplier_data)
         else:
             supplier_data = {
                 "supplierId": supplier_id,
@@ -241,7 +787,67 @@ async def get_supplier_info(supplier_id, progress_handler=None):
                 "unn": "Неизвестно",
                 "supplierUrl": f"https://www.wildberries.ru/seller/{supplier_id}",
             }
-            sellers_cache[supplier_id] = supplier_data
+            # Неудачный запрос кэшируется с коротким сроком жизни
+            cache.set(supplier_id, supplier_data, found=False)
         if progress_handler:
             progress_handler.update(1)
-        return supplier_data
\ No newline at end of file
+        return supplier_data
+
+class SupplierResolver:
+    """Получение продавцов по мере появления supplierId в потоке товаров.
+
+    На каждый ID делается не более одного запроса: повторные обращения
+    ждут уже запущенную задачу (single-flight).
+    """
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or sellers_cache
+        self._tasks = {}  # supplier_id -> задача получения данных
+
+    def submit(self, supplier_id):
+        """Запуск получения продавца, если он еще не запрошен."""
+        if not supplier_id or supplier_id in self._tasks:
+            return
+        self._tasks[supplier_id] = asyncio.ensure_future(
+            get_supplier_info(supplier_id, client=self.client, cache=self.cache)
+        )
+
+    def submit_products(self, products):
+        """Запуск получения продавцов для порции товаров; известные берутся из кэша одним запросом."""
+        new_ids = {p.supplierId for p in products if p.supplierId and p.supplierId not in self._tasks}
+        if not new_ids:
+            return
+        self.cache.warm(new_ids)
+        for supplier_id in new_ids:
+            self.submit(supplier_id)
+
+    async def resolve(self, supplier_id):
+        self.submit(supplier_id)
+        return await self._tasks[supplier_id]
+
+    async def results(self, progress_handler=None, supplier_ids=None):
+        """Ожидание запущенных запросов; возвращает данные продавцов, отсортированные по ID.
+
+        supplier_ids ограничивает результат нужными ID (когда резолвер общий для нескольких запусков).
+        """
+        if supplier_ids is None:
+            supplier_ids = self._tasks
+        supplier_ids = sorted(supplier_id for supplier_id in supplier_ids if supplier_id in self._tasks)
+        if progress_handler:
+            progress_handler.set_total(len(supplier_ids))
+        results = []
+        for supplier_id in supplier_ids:
+            try:
+                results.append(await self._tasks[supplier_id])
+            except Exception as e:
+                logger.error(f"Ошибка получения продавца {supplier_id}: {e}")
+            if progress_handler:
+                progress_handler.update(1)
+        return results
+
+    def cancel(self):
+        """Отмена незавершенных запросов."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,48 @@
+import asyncio
+
+
+class ProductBudget:
+    """Общий лимит товаров, который атомарно делят между собой задачи брендов.
+
+    Перед запросом страницы задача резервирует место (acquire), после разбора
+    фиксирует фактически взятое количество (commit), а остаток возвращается в бюджет.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.remaining = total  # Еще не зарезервировано
+        self.used = 0  # Уже получено товаров
+        self.exhausted = asyncio.Event()
+        self._changed = asyncio.Event()
+        if total <= 0:
+            self.exhausted.set()
+
+    async def acquire(self, wanted):
+        """Резервирование до wanted товаров; 0 - бюджет исчерпан."""
+        while True:
+            if self.exhausted.is_set():
+                return 0
+            if self.remaining > 0:
+                granted = min(wanted, self.remaining)
+                self.remaining -= granted
+                return granted
+            # Все свободное место зарезервировано другими задачами - ждем, вернут ли его
+            self._changed.clear()
+            await self._changed.wait()
+
+    def try_acquire(self, wanted):
+        """Резервирование без ожидания: 0, если свободного места сейчас нет."""
+        if self.exhausted.is_set():
+            return 0
+        granted = min(wanted, self.remaining)
+        self.remaining -= granted
+        return granted
+
+    def commit(self, granted, used):
+        """Фиксация использованной части резерва и возврат остатка."""
+        used = min(used, granted)
+        self.used += used
+        self.remaining += granted - used
+        if self.used >= self.total:
+            self.exhausted.set()
+        self._changed.set()
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import astuple
+from utils.records import Product
+
+logger = logging.getLogger(__name__)
+
+
+def checkpoint_path(output_file):
+    """Файл контрольной точки рядом с файлом результата."""
+    return output_file + ".checkpoint.sqlite"
+
+
+class CrawlCheckpoint:
+    """Контрольная точка сбора товаров в SQLite.
+
+    Хранит собранные товары, состояние обхода каталога (последняя страница,
+    счетчики брендов), план обхода брендов и для каждого бренда последнюю
+    обработанную страницу. Изменения копятся в памяти и сбрасываются на диск
+    одной транзакцией не чаще, чем раз в interval секунд, поэтому товары
+    и отметки о страницах всегда согласованы между собой.
+    При resume=False или если файл создан для другого запроса, он очищается.
+    supplier_cache сбрасывается на диск вместе с контрольной точкой.
+    dest - регион обхода: товары, собранные в другом регионе, не продолжаются.
+    """
+
+    def __init__(self, path, query, max_products, resume=False, interval=5.0, supplier_cache=None, dest=None):
+        self.path = path
+        self.interval = interval
+        self.supplier_cache = supplier_cache
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS products (article INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS brands ("
+                "brand_id INTEGER PRIMARY KEY, last_page INTEGER NOT NULL, count INTEGER NOT NULL, finished INTEGER NOT NULL)"
+            )
+        params = {"query": query, "max_products": max_products}
+        if dest is not None:
+            params["dest"] = dest
+        params = json.dumps(params, ensure_ascii=False)
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if not resume or meta.get("params") != params:
+            if resume and meta:
+                logger.warning(f"Контрольная точка {path} создана для другого запроса, сбор начинается заново")
+            self._reset(params)
+            meta = {"params": params}
+
+        self.discovery = json.loads(meta["discovery"]) if "discovery" in meta else None
+        if self.discovery:
+            self.discovery["brand_counts"] = {int(k): v for k, v in self.discovery["brand_counts"].items()}
+        self.jobs = json.loads(meta["jobs"]) if "jobs" in meta else None
+        self.brands = {
+            brand_id: (last_page, count, bool(finished))
+            for brand_id, last_page, count, finished in self.conn.execute("SELECT brand_id, last_page, count, finished FROM brands")
+        }
+        self.restored_count = self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        self._products = []  # Товары, еще не сброшенные на диск
+        self._meta = {}
+        self._brands = {}
+        self._flushed_at = time.monotonic()
+
+    def _reset(self, params):
+        with self.conn:
+            for table in ("meta", "products", "brands"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('params', ?)", (params,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def restored_products(self, chunk_size=1000):
+        """Товары из контрольной точки порциями в порядке получения."""
+        cursor = self.conn.execute("SELECT data FROM products ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [Product(*json.loads(data)) for data, in rows]
+
+    def brand_state(self, brand_id):
+        """(последняя обработанная страница, товаров собрано, бренд завершен)."""
+        return self.brands.get(brand_id, (0, 0, False))
+
+    def _add_products(self, products):
+        self._products.extend((p.article, json.dumps(astuple(p), ensure_ascii=False)) for p in products)
+
+    def save_discovery(self, page, brand_counts, total, products, done=False, complete=False):
+        """Отметка обработанной страницы обхода каталога."""
+        self._add_products(products)
+        self.discovery = {"page": page, "brand_counts": brand_counts, "total": total, "done": done, "complete": complete}
+        self._meta["discovery"] = json.dumps(self.discovery)
+        self._maybe_flush()
+
+    def save_jobs(self, jobs):
+        """План обхода брендов: [(brand_id, quota, pages)]."""
+        self.jobs = [list(job) for job in jobs]
+        self._meta["jobs"] = json.dumps(self.jobs)
+        self._maybe_flush()
+
+    def save_brand_page(self, brand_id, page, count, products, finished=False):
+        """Отметка обработанной страницы бренда."""
+        self._add_products(products)
+        self.brands[brand_id] = self._brands[brand_id] = (page, count, finished)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных изменений на диск одной транзакцией."""
+        self._flushed_at = time.monotonic()
+        if self.supplier_cache is not None:
+            self.supplier_cache.flush()
+        if self.conn is None or not (self._products or self._meta or self._brands):
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO products (article, data) VALUES (?, ?)", self._products)
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", self._meta.items())
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO brands (brand_id, last_page, count, finished) VALUES (?, ?, ?, ?)",
+                [(brand_id, page, count, int(finished)) for brand_id, (page, count, finished) in self._brands.items()],
+            )
+        self._products = []
+        self._meta = {}
+        self._brands = {}
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def discard(self):
+        """Удаление контрольной точки после успешного завершения."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,88 @@
+import aiohttp
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from utils.metrics import Metrics
+from utils.retry import LatencyTracker, RetryPolicy
+from utils.scheduler import RequestScheduler
+
+# Регион доставки (параметр dest) по умолчанию - Москва
+DEFAULT_DEST = -1255987
+
+
+class ApiClient:
+    """Общий HTTP-клиент с пулом соединений на всё время работы парсера."""
+
+    def __init__(self, limit=100, limit_per_host=64, dns_ttl=300, keepalive_timeout=30, timeout=10, scheduler=None, retry_policy=None, host_overrides=None, trace_configs=None, metrics=None, dest=DEFAULT_DEST):
+        self.limit = limit  # Общий лимит соединений в пуле
+        self.limit_per_host = limit_per_host  # Лимит соединений на один хост
+        self.dns_ttl = dns_ttl  # Время жизни DNS-кэша в секундах
+        self.keepalive_timeout = keepalive_timeout  # Сколько держать простаивающее соединение
+        self.timeout = timeout
+        # Все запросы проходят через планировщик с лимитами по хостам
+        self.scheduler = scheduler or RequestScheduler()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._latency = {}  # Задержки успешных ответов по хостам
+        # Подмена адресов хостов, например {"search.wb.ru": "http://127.0.0.1:8080"} для локального стенда;
+        # лимиты планировщика при этом считаются по исходному хосту
+        self.host_overrides = host_overrides or {}
+        self.trace_configs = trace_configs  # aiohttp.TraceConfig для замеров (бенчмарк)
+        self.metrics = metrics or Metrics()
+        self.dest = dest  # Регион доставки, от которого зависят цены и наличие в выдаче
+        self.session = None
+
+    def latency_tracker(self, url):
+        """Окно задержек хоста из url (для хеджирования запросов)."""
+        host = urlsplit(url).hostname
+        tracker = self._latency.get(host)
+        if tracker is None:
+            tracker = self._latency[host] = LatencyTracker()
+        return tracker
+
+    def resolve_url(self, url):
+        """Фактический адрес запроса с учетом host_overrides."""
+        if not self.host_overrides:
+            return url
+        parts = urlsplit(url)
+        base = self.host_overrides.get(parts.hostname)
+        if base is None:
+            return url
+        return base.rstrip("/") + url[len(f"{parts.scheme}://{parts.netloc}"):]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Создание сессии с общим пулом соединений."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=self.trace_configs,
+            )
+
+    async def close(self):
+        """Закрытие сессии и всех соединений пула."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+@asynccontextmanager
+async def ensure_client(client=None):
+    """Использует переданный клиент или создает временный на время вызова."""
+    if client is not None:
+        yield client
+        return
+    async with ApiClient() as new_client:
+        yield new_client
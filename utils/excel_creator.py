@@ -1,114 +1,171 @@
-import pandas as pd
-from openpyxl import load_workbook
+import logging
+from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 
+logger = logging.getLogger(__name__)
 
-def save_to_excel(data, supplier_data, output_file):
-    """Сохранение данных в Excel файл, объединяя товары и информацию о продавцах в одном листе."""
-    try:
-        # Преобразуем данные о товарах в список словарей с плоской структурой
-        flat_data = []
-        for product in data:
-            flat_product = {
-                "Артикул": product["article"],
-                "Название": product["name"],
-                "Бренд": product["brand"],
-                "URL": product["url"],
-                "Обычная цена": product["price"]["basic"],
-                "Цена по ВБ Карте": product["price"]["product"],
-                "Цена без ВБ Карты": product["price"]["total"],
-                "Отзывы": product["feedbacks"],
-                "Рейтинг": product["rating"],
-                "Поставщик(продавец)": product["supplier"],
-                "ID продавца": product["supplierId"],
-                "Рейтинг продавца": product["supplierRating"],
-            }
-            flat_data.append(flat_product)
-
-        # Создаем DataFrame для товаров
-        df = pd.DataFrame(flat_data)
-
-        # Преобразуем данные о продавцах в DataFrame
-        flat_supplier_data = [
-            {
-                "ID продавца": supplier["supplierId"],
-                "Название продавца": supplier["supplierName"],
-                "Полное юридическое название": supplier["supplierFullName"],
-                "ИНН": supplier["inn"],
-                "ОГРН": supplier["ogrn"],
-                "ОГРНИП": supplier["ogrnip"],
-                "Юридический адрес": supplier["legalAddress"],
-                "Торговая марка": supplier["trademark"],
-                "КПП": supplier["kpp"],
-                "Номер регистрации": supplier["taxpayerCode"],
-                "УНП": supplier["unp"],
-                "БИН": supplier["bin"],
-                "УНН": supplier["unn"],
-                "Ссылка на продавца": supplier["supplierUrl"],
-            }
-            for supplier in supplier_data
-        ]
-        supplier_df = pd.DataFrame(flat_supplier_data)
-
-        # Объединяем данные о товарах и продавцах по ID продавца (left join)
-        merged_df = pd.merge(
-            df, supplier_df, on="ID продавца", how="left", suffixes=("", "_продавец")
-        )
-
-        # Сохраняем в Excel в один лист
-        with pd.ExcelWriter(output_file, engine="openpyxl", mode="w") as writer:
-            merged_df.to_excel(writer, sheet_name="Товары и продавцы", index=False)
-
-        # Открываем Excel-файл для настройки ширины столбцов
-        workbook = load_workbook(output_file)
-        worksheet = workbook["Товары и продавцы"]
-
-        # Настройка ширины столбцов
-        columns_to_widen_one = [
-            "Артикул",
-            "Бренд",
-            "Обычная цена",
-            "Цена по ВБ Карте",
-            "Цена без ВБ Карты",
-            "ID продавца",
-            "ИНН",
-            "ОГРН",
-            "ОГРНИП",
-            "КПП",
-            "Номер регистрации",
-            "УНП",
-            "БИН",
-            "УНН",
-        ]
-        columns_to_widen_two = [
-            "Поставщик(продавец)",
-            "Название продавца",
-            "Торговая марка",
-        ]
-        columns_to_widen_three = [
-            "Название",
-            "URL",
-            "Полное юридическое название",
-            "Юридический адрес",
-            "Ссылка на продавца",
-        ]
-        default_width = 8.43  # Стандартная ширина столбца в openpyxl
-        first_width = float(default_width * 1.3)  # Увеличиваем ширину в 1.3 раза
-        second_width = float(default_width * 3)  # Увеличиваем ширину в 3 раза
-        third_width = float(default_width * 6)  # Увеличиваем ширину в 6 раз
-
-        for col_idx, col_name in enumerate(merged_df.columns, start=1):
+SHEET_NAME = "Товары и продавцы"
+
+# Колонки товаров
+PRODUCT_COLUMNS = [
+    "Артикул",
+    "Название",
+    "Бренд",
+    "URL",
+    "Обычная цена",
+    "Цена по ВБ Карте",
+    "Цена без ВБ Карты",
+    "Отзывы",
+    "Рейтинг",
+    "Поставщик(продавец)",
+    "ID продавца",
+    "Рейтинг продавца",
+]
+
+# Колонки продавцов (ID продавца уже есть среди колонок товаров)
+SUPPLIER_COLUMNS = [
+    "Название продавца",
+    "Полное юридическое название",
+    "ИНН",
+    "ОГРН",
+    "ОГРНИП",
+    "Юридический адрес",
+    "Торговая марка",
+    "КПП",
+    "Номер регистрации",
+    "УНП",
+    "БИН",
+    "УНН",
+    "Ссылка на продавца",
+]
+
+COLUMNS = PRODUCT_COLUMNS + SUPPLIER_COLUMNS
+
+# Настройка ширины столбцов
+columns_to_widen_one = [
+    "Артикул",
+    "Бренд",
+    "Обычная цена",
+    "Цена по ВБ Карте",
+    "Цена без ВБ Карты",
+    "ID продавца",
+    "ИНН",
+    "ОГРН",
+    "ОГРНИП",
+    "КПП",
+    "Номер регистрации",
+    "УНП",
+    "БИН",
+    "УНН",
+]
+columns_to_widen_two = [
+    "Поставщик(продавец)",
+    "Название продавца",
+    "Торговая марка",
+]
+columns_to_widen_three = [
+    "Название",
+    "URL",
+    "Полное юридическое название",
+    "Юридический адрес",
+    "Ссылка на продавца",
+]
+default_width = 8.43  # Стандартная ширина столбца в openpyxl
+first_width = float(default_width * 1.3)  # Увеличиваем ширину в 1.3 раза
+second_width = float(default_width * 3)  # Увеличиваем ширину в 3 раза
+third_width = float(default_width * 6)  # Увеличиваем ширину в 6 раз
+
+
+def product_row(product):
+    """Значения колонок товара в порядке PRODUCT_COLUMNS."""
+    return [
+        product.article,
+        product.name,
+        product.brand,
+        product.url,
+        product.price_basic,
+        product.price_product,
+        product.price_total,
+        product.feedbacks,
+        product.rating,
+        product.supplier,
+        product.supplierId,
+        product.supplierRating,
+    ]
+
+
+def supplier_row(supplier):
+    """Значения колонок продавца в порядке SUPPLIER_COLUMNS."""
+    return [
+        supplier["supplierName"],
+        supplier["supplierFullName"],
+        supplier["inn"],
+        supplier["ogrn"],
+        supplier["ogrnip"],
+        supplier["legalAddress"],
+        supplier["trademark"],
+        supplier["kpp"],
+        supplier["taxpayerCode"],
+        supplier["unp"],
+        supplier["bin"],
+        supplier["unn"],
+        supplier["supplierUrl"],
+    ]
+
+
+class ExcelStreamWriter:
+    """Однопроходная запись товаров с данными продавцов в Excel.
+
+    Использует write-only режим openpyxl: заголовки, ширины столбцов и строки
+    пишутся сразу в поток, файл не перечитывается. Данные продавца
+    подставляются в строку товара по словарю supplierId -> колонки продавца.
+    """
+
+    def __init__(self, output_file, supplier_data=()):
+        self.output_file = output_file
+        self.suppliers = {supplier["supplierId"]: supplier_row(supplier) for supplier in supplier_data}
+        self._empty_supplier = [None] * len(SUPPLIER_COLUMNS)
+        self.workbook = Workbook(write_only=True)
+        self.worksheet = self.workbook.create_sheet(SHEET_NAME)
+        for col_idx, col_name in enumerate(COLUMNS, start=1):
             column_letter = get_column_letter(col_idx)
             if col_name in columns_to_widen_one:
-                worksheet.column_dimensions[column_letter].width = first_width
+                self.worksheet.column_dimensions[column_letter].width = first_width
             elif col_name in columns_to_widen_two:
-                worksheet.column_dimensions[column_letter].width = second_width
+                self.worksheet.column_dimensions[column_letter].width = second_width
             elif col_name in columns_to_widen_three:
-                worksheet.column_dimensions[column_letter].width = third_width
+                self.worksheet.column_dimensions[column_letter].width = third_width
+        self.worksheet.append(COLUMNS)
+        self.rows = 0
+
+    def write(self, products):
+        """Запись порции товаров."""
+        for product in products:
+            supplier = self.suppliers.get(product.supplierId, self._empty_supplier)
+            self.worksheet.append(product_row(product) + supplier)
+            self.rows += 1
+
+    def add_sheet(self, title, header, rows):
+        """Дополнительный лист (например, сводка): заголовок и строки значений."""
+        worksheet = self.workbook.create_sheet(title)
+        for col_idx in range(1, len(header) + 1):
+            worksheet.column_dimensions[get_column_letter(col_idx)].width = first_width if col_idx > 1 else second_width
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append(list(row))
 
-        # Сохраняем изменения
-        workbook.save(output_file)
-        print(f"Создан файл {output_file}")
+    def close(self, supplier_data=None):
+        """Сохранение книги; продавцы уже переданы в конструктор."""
+        self.workbook.save(self.output_file)
+
+
+def save_to_excel(data, supplier_data, output_file):
+    """Сохранение данных в Excel файл, объединяя товары и информацию о продавцах в одном листе."""
+    try:
+        writer = ExcelStreamWriter(output_file, supplier_data)
+        writer.write(data)
+        writer.close()
+        logger.info(f"Создан файл {output_file}")
 
     except Exception as e:
         raise Exception(f"Ошибка при записи Excel файла {output_file}: {str(e)}")
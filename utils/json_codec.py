@@ -0,0 +1,30 @@
+import json
+
+# Самый быстрый из установленных декодеров JSON; стандартный json - запасной вариант
+try:
+    import orjson
+
+    loads = orjson.loads
+    DECODE_ERRORS = (orjson.JSONDecodeError,)
+    BACKEND = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        loads = msgspec.json.Decoder().decode
+        DECODE_ERRORS = (msgspec.DecodeError,)
+        BACKEND = "msgspec"
+    except ImportError:
+        loads = json.loads
+        DECODE_ERRORS = (json.JSONDecodeError,)
+        BACKEND = "json"
+
+def decode(body):
+    """Разбор JSON из байтов.
+
+    Разбор выполняется прямо в цикле событий: все три декодера держат GIL
+    на весь разбор, поэтому вынос в поток цикл не освобождает, а только
+    добавляет переключение. Страница каталога (до 100 товаров) разбирается
+    за доли миллисекунды.
+    """
+    return loads(body)
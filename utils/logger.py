@@ -0,0 +1,26 @@
+import logging
+import os
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def setup_logging(log_dir="logs", level=logging.INFO):
+    """Настройка журналов: logs/info.log (INFO и выше), logs/error.log (ERROR и выше)
+    и предупреждения в консоль. Повторный вызов ничего не меняет."""
+    root = logging.getLogger()
+    if getattr(root, "_wb_configured", False):
+        return
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = [
+        (logging.FileHandler(os.path.join(log_dir, "info.log"), encoding="utf-8"), logging.INFO),
+        (logging.FileHandler(os.path.join(log_dir, "error.log"), encoding="utf-8"), logging.ERROR),
+        (logging.StreamHandler(), logging.WARNING),
+    ]
+    for handler, handler_level in handlers:
+        handler.setLevel(handler_level)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(level)
+    root._wb_configured = True
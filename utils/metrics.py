@@ -0,0 +1,159 @@
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Границы корзин гистограммы задержек в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: наблюдение - один bisect и три сложения."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - больше всех границ
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля сверху: граница корзины, в которую он попадает."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Метрики запуска: запросы по эндпоинтам и статусам, задержки, объем ответов,
+    события (повторы, дубли, потерянные запросы), попадания в кэши и время фаз.
+
+    Счетчики - обычные словари, поэтому запись на горячем пути почти ничего не стоит.
+    Отчет доступен в JSON (report, save_report) и в текстовом формате Prometheus (prometheus).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = {}  # (endpoint, status) -> число запросов
+        self.latency = {}  # endpoint -> Histogram
+        self.bytes = {}  # endpoint -> байт в телах ответов
+        self.events = {}  # (event, endpoint) -> число событий
+        self.cache = {}  # имя кэша -> [попадания, промахи]
+        self.phases = {}  # фаза -> секунды
+
+    def observe_request(self, endpoint, status, latency, size=0):
+        """Учет одного HTTP-запроса; status=None - таймаут или сетевая ошибка."""
+        key = (endpoint, "error" if status is None else status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get(endpoint)
+        if histogram is None:
+            histogram = self.latency[endpoint] = Histogram()
+        histogram.observe(latency)
+        if size:
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+
+    def event(self, event, endpoint):
+        """Учет события: retry, hedge или dropped (запрос так и не дал данных)."""
+        key = (event, endpoint)
+        self.events[key] = self.events.get(key, 0) + 1
+
+    def cache_lookup(self, name, hit):
+        counts = self.cache.get(name)
+        if counts is None:
+            counts = self.cache[name] = [0, 0]
+        counts[0 if hit else 1] += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Замер времени фазы; повторные замеры одной фазы суммируются."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+    def report(self):
+        """Отчет о запуске в виде словаря для JSON."""
+        endpoints = {}
+        for (endpoint, status), count in self.requests.items():
+            entry = endpoints.setdefault(endpoint, {"requests": 0, "statuses": {}})
+            entry["requests"] += count
+            entry["statuses"][str(status)] = count
+        for endpoint, entry in endpoints.items():
+            histogram = self.latency[endpoint]
+            entry["bytes"] = self.bytes.get(endpoint, 0)
+            for event in ("retry", "hedge", "dropped"):
+                entry[event] = self.events.get((event, endpoint), 0)
+            entry["latency_ms"] = {
+                "mean": round(histogram.sum / histogram.count * 1000, 1),
+                "p50": round(histogram.quantile(0.5) * 1000, 1),
+                "p95": round(histogram.quantile(0.95) * 1000, 1),
+                "p99": round(histogram.quantile(0.99) * 1000, 1),
+                "max": round(histogram.max * 1000, 1),
+            }
+        duration = time.time() - self.started
+        total = sum(self.requests.values())
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "duration_s": round(duration, 3),
+            "requests": total,
+            "requests_per_s": round(total / duration, 1) if duration else None,
+            "endpoints": endpoints,
+            "cache": {
+                name: {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None}
+                for name, (hits, misses) in self.cache.items()
+            },
+            "phases_s": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+    def save_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def prometheus(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = ["# TYPE wb_requests_total counter"]
+        for (endpoint, status), count in sorted(self.requests.items(), key=str):
+            lines.append(f'wb_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE wb_request_duration_seconds histogram")
+        for endpoint, histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'wb_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'wb_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+            lines.append(f'wb_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+            lines.append(f'wb_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+        lines.append("# TYPE wb_response_bytes_total counter")
+        for endpoint, size in sorted(self.bytes.items()):
+            lines.append(f'wb_response_bytes_total{{endpoint="{endpoint}"}} {size}')
+        lines.append("# TYPE wb_request_events_total counter")
+        for (event, endpoint), count in sorted(self.events.items()):
+            lines.append(f'wb_request_events_total{{endpoint="{endpoint}",event="{event}"}} {count}')
+        lines.append("# TYPE wb_cache_lookups_total counter")
+        for name, (hits, misses) in sorted(self.cache.items()):
+            lines.append(f'wb_cache_lookups_total{{cache="{name}",result="hit"}} {hits}')
+            lines.append(f'wb_cache_lookups_total{{cache="{name}",result="miss"}} {misses}')
+        lines.append("# TYPE wb_phase_seconds gauge")
+        for name, seconds in sorted(self.phases.items()):
+            lines.append(f'wb_phase_seconds{{phase="{name}"}} {seconds:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
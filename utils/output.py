@@ -0,0 +1,86 @@
+import logging
+from utils.spool import ProductSpool, field_key
+from utils.writers import detect_format, open_writer
+
+logger = logging.getLogger(__name__)
+
+
+class ProductOutput:
+    """Вывод потока товаров в файл.
+
+    Колоночные форматы без сортировки дописываются прямо во время сбора.
+    Excel объединяет товары с продавцами в строке, поэтому он, как и вывод
+    с сортировкой, пишется в конце из спула (ProductSpool) с выгрузкой на диск.
+    При dedup=True повторные артикулы отбрасываются.
+    summary=True - дополнительно записать сводку по брендам и продавцам (ProductSummary):
+    в Excel отдельными листами, в остальных форматах соседними файлами.
+    """
+
+    def __init__(self, output_file, output_format=None, sort_by=None, chunk_size=50000, dedup=False, summary=False):
+        self.output_file = output_file
+        self.output_format = output_format or detect_format(output_file)
+        self.chunk_size = chunk_size
+        self.summary = None
+        if summary:
+            from utils.analytics import ProductSummary
+            self.summary = ProductSummary()
+        key = field_key(sort_by) if sort_by else None
+        self.spool = ProductSpool(key=key, chunk_size=chunk_size)
+        self.writer = None
+        if self.output_format != "xlsx" and key is None:
+            self.writer = open_writer(output_file, self.output_format)
+        self.seen = set() if dedup else None
+
+    def add(self, products):
+        """Добавление порции товаров."""
+        if self.seen is not None:
+            fresh = []
+            for product in products:
+                if product.article not in self.seen:
+                    self.seen.add(product.article)
+                    fresh.append(product)
+            products = fresh
+        if self.summary is not None:
+            self.summary.add(products)
+        if self.writer is not None:
+            self.writer.write(products)
+        else:
+            self.spool.add(products)
+
+    def close(self, supplier_data, tables=()):
+        """Запись накопленного и закрытие файла.
+
+        tables - дополнительные таблицы (RegionPrices и т.п.) с методом
+        write(output_file, output_format, writer), как у сводки.
+        """
+        try:
+            if self.writer is None:
+                self.writer = open_writer(self.output_file, self.output_format, supplier_data)
+                for products in _chunks(self.spool, self.chunk_size):
+                    self.writer.write(products)
+            if self.summary is not None:
+                tables = [self.summary, *tables]
+            for table in tables:
+                table.write(self.output_file, self.output_format, self.writer)
+            self.writer.close(supplier_data)
+        finally:
+            self.spool.close()
+        logger.info(f"Создан файл {self.output_file}")
+
+    def abort(self):
+        """Закрытие без записи данных продавцов (при ошибке сбора)."""
+        if self.writer is not None:
+            self.writer.close()
+        self.spool.close()
+
+
+def _chunks(items, size):
+    """Разбиение потока на списки по size элементов."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,104 @@
+import math
+from dataclasses import dataclass
+
+# Количество товаров на одной странице каталога
+PAGE_SIZE = 100
+# Сколько страниц поиск отдает по одному запросу (в том числе с фильтром по бренду)
+CATALOG_DEPTH_CAP = 100
+
+# Политики распределения лимита товаров между брендами
+POLICIES = ("proportional", "largest", "even")
+
+
+@dataclass
+class BrandPlan:
+    """План обхода одного бренда."""
+    brand_id: int
+    name: str
+    count: int  # Сколько товаров бренда есть по запросу
+    quota: int  # Сколько товаров бренда нужно забрать
+    pages: int  # Сколько страниц запросить
+
+
+def parse_brand_facets(data):
+    """Извлечение фасета брендов из ответа resultset=filters: список (id, name, count)."""
+    if not data or not isinstance(data.get("data"), dict):
+        return []
+    for facet in data["data"].get("filters") or []:
+        if facet.get("key") == "fbrand":
+            return [
+                (item["id"], item.get("name", ""), item.get("count", 0))
+                for item in facet.get("items") or []
+                if item.get("id") and item.get("count")
+            ]
+    return []
+
+
+def _proportional(counts, limit):
+    total = sum(counts)
+    # Метод наибольших остатков: целые части, затем по одному товару самым большим остаткам
+    shares = [limit * count / total for count in counts]
+    quotas = [min(count, int(share)) for count, share in zip(counts, shares)]
+    leftover = limit - sum(quotas)
+    order = sorted(range(len(counts)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    for i in order:
+        if leftover <= 0:
+            break
+        if quotas[i] < counts[i]:
+            quotas[i] += 1
+            leftover -= 1
+    return quotas
+
+
+def _largest(counts, limit):
+    quotas = [0] * len(counts)
+    for i in sorted(range(len(counts)), key=lambda i: counts[i], reverse=True):
+        quotas[i] = min(counts[i], limit)
+        limit -= quotas[i]
+        if limit <= 0:
+            break
+    return quotas
+
+
+def _even(counts, limit):
+    # Поровну, а недобор маленьких брендов перераспределяется между остальными
+    quotas = [0] * len(counts)
+    active = [i for i in range(len(counts)) if counts[i] > 0]
+    while limit > 0 and active:
+        share = max(1, limit // len(active))
+        for i in list(active):
+            take = min(share, counts[i] - quotas[i], limit)
+            quotas[i] += take
+            limit -= take
+            if quotas[i] >= counts[i]:
+                active.remove(i)
+            if limit <= 0:
+                break
+    return quotas
+
+
+def plan_crawl(facets, max_products, policy="proportional"):
+    """Распределение max_products между брендами и расчет числа страниц для каждого.
+
+    facets - список (brand_id, name, count). Если товаров меньше лимита, берется всё.
+    Бренды с нулевой квотой в план не попадают.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Неизвестная политика распределения: {policy}")
+    counts = [count for _, _, count in facets]
+    total = sum(counts)
+    if total <= max_products:
+        quotas = counts
+    elif policy == "proportional":
+        quotas = _proportional(counts, max_products)
+    elif policy == "largest":
+        quotas = _largest(counts, max_products)
+    else:
+        quotas = _even(counts, max_products)
+
+    plans = []
+    for (brand_id, name, count), quota in zip(facets, quotas):
+        if quota > 0:
+            pages = min(math.ceil(quota / PAGE_SIZE), CATALOG_DEPTH_CAP)
+            plans.append(BrandPlan(brand_id, name, count, quota, pages))
+    return plans
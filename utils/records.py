@@ -0,0 +1,96 @@
+from array import array
+from dataclasses import dataclass, fields
+from math import isnan
+
+NAN = float("nan")
+
+
+def product_url(article):
+    """Ссылка на карточку товара по артикулу."""
+    return f"https://www.wildberries.ru/catalog/{article}/detail.aspx"
+
+
+@dataclass(slots=True)
+class Product:
+    """Товар с фиксированной схемой.
+
+    Поля совпадают с плоской схемой выгрузки; url не хранится, а вычисляется по артикулу.
+    """
+    article: int
+    name: str
+    brand: str
+    price_basic: float = None  # Обычная цена
+    price_product: float = None  # Цена по ВБ Карте
+    price_total: float = None  # Цена без ВБ Карты
+    feedbacks: int = 0
+    rating: float = 0
+    supplier: str = "Неизвестный продавец"
+    supplierId: int = 0
+    supplierRating: float = 0
+
+    @property
+    def url(self):
+        return product_url(self.article)
+
+
+PRODUCT_FIELD_NAMES = [field.name for field in fields(Product)]
+
+# Типы колонок пакета: q - int64, d - float64 (None хранится как NaN), остальное - список строк
+_BATCH_TYPECODES = {
+    "article": "q",
+    "price_basic": "d",
+    "price_product": "d",
+    "price_total": "d",
+    "feedbacks": "q",
+    "rating": "d",
+    "supplierId": "q",
+    "supplierRating": "d",
+}
+
+
+class ProductBatch:
+    """Колоночный пакет товаров на массивах array.
+
+    Числовые колонки хранятся непрерывными массивами, что в разы компактнее
+    отдельных объектов и удобно для передачи в колоночные писатели.
+    """
+
+    def __init__(self):
+        self.columns = {
+            name: array(_BATCH_TYPECODES[name]) if name in _BATCH_TYPECODES else []
+            for name in PRODUCT_FIELD_NAMES
+        }
+
+    @classmethod
+    def from_products(cls, products):
+        batch = cls()
+        batch.extend(products)
+        return batch
+
+    def __len__(self):
+        return len(self.columns["article"])
+
+    def append(self, product):
+        for name, column in self.columns.items():
+            value = getattr(product, name)
+            if value is None:
+                typecode = _BATCH_TYPECODES.get(name)
+                value = NAN if typecode == "d" else 0 if typecode == "q" else None
+            column.append(value)
+
+    def extend(self, products):
+        for product in products:
+            self.append(product)
+
+    def column(self, name):
+        """Колонка в виде списка; NaN в вещественных колонках заменяется на None."""
+        column = self.columns[name]
+        if _BATCH_TYPECODES.get(name) == "d":
+            return [None if isnan(value) else value for value in column]
+        return list(column)
+
+    def __iter__(self):
+        """Восстановление объектов Product."""
+        columns = [self.column(name) for name in PRODUCT_FIELD_NAMES]
+        for values in zip(*columns):
+            yield Product(*values)
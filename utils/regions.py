@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from utils.api import CARD_BATCH_SIZE, get_region_prices
+from utils.writers import sibling_path, write_table
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = "Цены по регионам"
+
+# Колонки региона в широкой таблице: (поле, тип, заголовок в Excel)
+REGION_FIELDS = [
+    ("price_basic", "float64", "Обычная цена"),
+    ("price_product", "float64", "Цена по ВБ Карте"),
+    ("price_total", "float64", "Цена без ВБ Карты"),
+    ("quantity", "int64", "Остаток"),
+]
+
+# Товара нет в регионе: цен нет, остаток 0
+_UNAVAILABLE = (None, None, None, 0)
+# Запрос региона не удался: значения неизвестны
+_UNKNOWN = (None, None, None, None)
+
+
+def parse_regions(spec):
+    """Разбор списка регионов "msk=-1257786,-1198055" в [(метка, dest)].
+
+    Без метки меткой служит сам dest.
+    """
+    regions = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        label, _, dest = item.rpartition("=")
+        try:
+            dest = int(dest)
+        except ValueError:
+            raise ValueError(f"Некорректный регион {item}: ожидается dest или метка=dest")
+        regions.append((label.strip() or str(dest), dest))
+    if not regions:
+        raise ValueError("Не указано ни одного региона")
+    return regions
+
+
+class RegionPrices:
+    """Цены и остатки уже собранных товаров в нескольких регионах доставки.
+
+    Каталог обходится и продавцы запрашиваются один раз; для регионов запрашиваются
+    только карточки по артикулам (по CARD_BATCH_SIZE за запрос), все регионы
+    одновременно. Результат - широкая таблица: артикул и колонки REGION_FIELDS
+    для каждого региона.
+    """
+
+    def __init__(self, regions):
+        self.regions = regions  # [(метка, dest)]
+        self.articles = []
+        self.prices = {label: {} for label, _ in regions}  # метка -> {артикул: значения}
+        self.failed = 0  # Неудавшихся запросов карточек
+
+    async def fetch(self, articles, client, progress_handler=None):
+        """Запрос цен по артикулам во всех регионах."""
+        self.articles = list(articles)
+        batches = [self.articles[i:i + CARD_BATCH_SIZE] for i in range(0, len(self.articles), CARD_BATCH_SIZE)]
+        if progress_handler:
+            progress_handler.set_total(len(batches) * len(self.regions))
+
+        async def fetch_batch(label, dest, batch):
+            prices = await get_region_prices(batch, dest, client)
+            if prices is None:
+                self.failed += 1
+            else:
+                region = self.prices[label]
+                for article in batch:
+                    region[article] = prices.get(article, _UNAVAILABLE)
+            if progress_handler:
+                progress_handler.update(1)
+
+        await asyncio.gather(*(fetch_batch(label, dest, batch) for label, dest in self.regions for batch in batches))
+        if self.failed:
+            logger.warning(f"Не получены цены по регионам для {self.failed} запросов карточек")
+
+    def fields(self):
+        """Схема широкой таблицы: [(поле, тип, заголовок)]."""
+        fields = [("article", "int64", "Артикул")]
+        for label, _ in self.regions:
+            fields += [(f"{field}_{label}", kind, f"{title} ({label})") for field, kind, title in REGION_FIELDS]
+        return fields
+
+    def rows(self):
+        """Строки широкой таблицы в порядке получения товаров."""
+        regions = [self.prices[label] for label, _ in self.regions]
+        for article in self.articles:
+            row = [article]
+            for region in regions:
+                row.extend(region.get(article, _UNKNOWN))
+            yield row
+
+    def write(self, output_file, output_format, writer=None):
+        """Запись таблицы: в Excel - листом книги writer (до ее сохранения),
+        в остальных форматах - соседним файлом products.regions.<ext>."""
+        fields = self.fields()
+        if output_format == "xlsx":
+            writer.add_sheet(SHEET_NAME, [title for _, _, title in fields], self.rows())
+        else:
+            write_table(sibling_path(output_file, "regions"), output_format, [(field, kind) for field, kind, _ in fields], self.rows())
+        logger.info(f"Цены по регионам: товаров {len(self.articles)}, регионов {len(self.regions)}")
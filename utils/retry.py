@@ -0,0 +1,66 @@
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+
+
+@dataclass
+class RetryPolicy:
+    """Политика повторов запросов.
+
+    Повторяются только временные ошибки: статусы из retry_statuses, таймауты
+    и сетевые ошибки. Пауза - экспоненциальная с полным джиттером, но не меньше
+    Retry-After из ответа сервера. При hedge=True, если ответ не пришел за p95
+    задержки хоста, отправляется дублирующий запрос и берется первый ответ.
+    """
+    attempts: int = 4  # Всего попыток, включая первую
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    retry_statuses: frozenset = field(default_factory=lambda: frozenset({429, 500, 502, 503, 504}))
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20  # Сколько замеров нужно, прежде чем доверять p95
+    hedge_min_delay: float = 0.05  # Не дублировать раньше, чем через это время
+
+    def is_retryable(self, status):
+        """status=None - таймаут или сетевая ошибка."""
+        return status is None or status in self.retry_statuses
+
+    def backoff(self, attempt, retry_after=None):
+        """Пауза перед повтором номер attempt (с нуля)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных ответов для оценки квантилей."""
+
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+
+    def add(self, latency):
+        self.samples.append(latency)
+
+    def quantile(self, q, min_samples=1):
+        """Квантиль задержки или None, если замеров недостаточно."""
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
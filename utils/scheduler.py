@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from urllib.parse import urlsplit
+
+
+@dataclass
+class HostLimits:
+    """Ограничения для одного хоста."""
+    rate: float = 20.0  # Запросов в секунду (скорость пополнения бакета)
+    burst: int = 10  # Емкость бакета
+    initial_concurrency: int = 4  # Стартовое число одновременных запросов
+    min_concurrency: int = 1
+    max_concurrency: int = 32  # Потолок одновременных запросов
+    latency_factor: float = 2.0  # Во сколько раз задержка может вырасти до снижения лимита
+
+    def scaled(self, share):
+        """Доля share лимитов - когда с одного адреса к хосту ходят несколько процессов."""
+        max_concurrency = max(1, int(self.max_concurrency * share))
+        return replace(
+            self,
+            rate=self.rate * share,
+            burst=max(1, int(self.burst * share)),
+            initial_concurrency=max(1, min(max_concurrency, int(self.initial_concurrency * share))),
+            min_concurrency=min(self.min_concurrency, max_concurrency),
+            max_concurrency=max_concurrency,
+        )
+
+    def capped(self, max_concurrency):
+        """Те же лимиты с потолком max_concurrency одновременных запросов."""
+        max_concurrency = max(1, min(self.max_concurrency, max_concurrency))
+        return replace(
+            self,
+            initial_concurrency=min(self.initial_concurrency, max_concurrency),
+            min_concurrency=min(self.min_concurrency, max_concurrency),
+            max_concurrency=max_concurrency,
+        )
+
+
+# Ограничения по умолчанию для хостов Wildberries
+DEFAULT_HOST_LIMITS = {
+    "search.wb.ru": HostLimits(rate=20.0, burst=10, initial_concurrency=4, max_concurrency=32),
+    "static-basket-01.wb.ru": HostLimits(rate=50.0, burst=25, initial_concurrency=8, max_concurrency=64),
+    "card.wb.ru": HostLimits(rate=20.0, burst=10, initial_concurrency=4, max_concurrency=32),
+}
+
+
+class TokenBucket:
+    """Токен-бакет, ограничивающий частоту запросов к хосту."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ожидание свободного токена."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """AIMD-ограничитель числа одновременных запросов.
+
+    Лимит растет на единицу за "окно" успешных быстрых ответов и уменьшается вдвое
+    при 429/5xx, сетевых ошибках или росте задержки относительно базовой.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.limit = float(limits.initial_concurrency)
+        self.in_flight = 0
+        self.base_latency = None  # Минимальная наблюдаемая задержка
+        self.latency = None  # Скользящее среднее задержки
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done():
+                    # Нас уже разбудили - передаем освободившийся слот следующему
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+
+    def release(self, status=None, latency=None):
+        """Освобождение слота; при переданной задержке лимит подстраивается."""
+        self.in_flight -= 1
+        if latency is not None:
+            self._adjust(status, latency)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _adjust(self, status, latency):
+        if status == 200:
+            self.latency = latency if self.latency is None else self.latency * 0.8 + latency * 0.2
+            if self.base_latency is None or latency < self.base_latency:
+                self.base_latency = latency
+            if self.latency > self.base_latency * self.limits.latency_factor:
+                self._decrease()
+            else:
+                # Аддитивный рост: +1 за каждые `limit` успешных ответов
+                self.limit = min(self.limits.max_concurrency, self.limit + 1 / self.limit)
+        elif status is None or status == 429 or status >= 500:
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        # Не снижаем лимит чаще одного раза за базовую задержку, иначе пачка 429 обнулит его
+        if now - self._last_decrease < (self.base_latency or 0.1):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limits.min_concurrency, self.limit / 2)
+        if self.base_latency is not None:
+            # Базовая задержка могла устареть - даем ей подрасти
+            self.base_latency *= 1.1
+
+
+class RequestSlot:
+    """Слот запроса: сюда записывается статус ответа для обратной связи."""
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
+
+
+class RequestScheduler:
+    """Планировщик, через который проходят все запросы: токен-бакет и AIMD на каждый хост.
+
+    share - доля лимитов этого процесса, если лимиты хостов делят несколько процессов.
+    max_concurrency - общий потолок одновременных запросов к каждому хосту.
+    """
+
+    def __init__(self, host_limits=None, default_limits=None, share=1.0, max_concurrency=None):
+        self.host_limits = dict(DEFAULT_HOST_LIMITS)
+        if host_limits:
+            self.host_limits.update(host_limits)
+        self.default_limits = default_limits or HostLimits()
+        if share != 1.0:
+            self.host_limits = {host: limits.scaled(share) for host, limits in self.host_limits.items()}
+            self.default_limits = self.default_limits.scaled(share)
+        if max_concurrency:
+            self.host_limits = {host: limits.capped(max_concurrency) for host, limits in self.host_limits.items()}
+            self.default_limits = self.default_limits.capped(max_concurrency)
+        self._hosts = {}
+
+    def _host_state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            limits = self.host_limits.get(host, self.default_limits)
+            state = (TokenBucket(limits.rate, limits.burst), AdaptiveLimiter(limits))
+            self._hosts[host] = state
+        return state
+
+    def concurrency(self, host):
+        """Текущий лимит одновременных запросов для хоста."""
+        return int(self._host_state(host)[1].limit)
+
+    @asynccontextmanager
+    async def slot(self, url, hedge=False):
+        """Ожидание разрешения на запрос к хосту из url.
+
+        hedge=True - дублирующий запрос: он берет токен бакета, но не ждет места
+        в лимите одновременных запросов, иначе дубль встал бы в очередь за тем
+        самым медленным запросом, который должен подстраховать.
+        """
+        bucket, limiter = self._host_state(urlsplit(url).hostname)
+        slot = RequestSlot()
+        if hedge:
+            await bucket.acquire()
+            yield slot
+            return
+        await limiter.acquire()
+        try:
+            await bucket.acquire()
+            start = time.monotonic()
+        except BaseException:
+            limiter.release()
+            raise
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            # Отмененный запрос ничего не говорит о состоянии хоста
+            limiter.release()
+            raise
+        except BaseException:
+            limiter.release(None, time.monotonic() - start)
+            raise
+        else:
+            limiter.release(slot.status, time.monotonic() - start)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+from dataclasses import astuple
+from utils.records import Product
+from utils.writers import FORMAT_EXTENSIONS
+
+# Файл снимков по умолчанию
+DEFAULT_SNAPSHOT_FILE = "snapshots.sqlite"
+
+# Поля, для которых в наборе изменений указываются старое и новое значения
+TRACKED_FIELDS = ["price_basic", "price_product", "price_total", "feedbacks", "rating"]
+
+
+def changes_path(output_file):
+    """Путь файла изменений рядом с файлом товаров: products.xlsx -> products.changes.jsonl."""
+    lower = output_file.lower()
+    for extension, _ in FORMAT_EXTENSIONS:
+        if lower.endswith(extension):
+            return output_file[:-len(extension)] + ".changes.jsonl"
+    return output_file + ".changes.jsonl"
+
+
+def brand_fingerprint(count, quota, products):
+    """Отпечаток бренда: число товаров в фасете, квота и товары первой страницы."""
+    digest = hashlib.sha1(json.dumps([count, quota], ensure_ascii=False).encode())
+    for product in products:
+        digest.update(json.dumps(astuple(product), ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    """Снимки результатов по запросам в SQLite, индекс по артикулу.
+
+    Во время обхода новые товары копятся в staging; после успешного запуска
+    write_changes сравнивает их с прошлым снимком, а commit заменяет снимок.
+    Для каждого бренда хранится отпечаток (см. brand_fingerprint), по которому
+    неизменившиеся бренды берутся из снимка без обхода; доля sample_rate из них
+    все равно обходится заново.
+    Один файл могут одновременно использовать несколько запусков (пакетный режим):
+    журнал WAL, чтение не держит курсор открытым между порциями, а staging
+    пишется пачками по stage_batch_size товаров.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_FILE, sample_rate=0.05, stage_batch_size=5000):
+        self.sample_rate = sample_rate
+        self.stage_batch_size = stage_batch_size
+        self.conn = sqlite3.connect(path)
+        # WAL: чтение снимка одним запуском не блокирует запись staging другим
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            for table in ("products", "staging"):
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "query TEXT NOT NULL, article INTEGER NOT NULL, brand_id INTEGER NOT NULL, data TEXT NOT NULL, "
+                    "PRIMARY KEY (query, article))"
+                )
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_brand ON {table} (query, brand_id)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS brands ("
+                "query TEXT NOT NULL, brand_id INTEGER NOT NULL, fingerprint TEXT NOT NULL, PRIMARY KEY (query, brand_id))"
+            )
+        self.query = None
+        self.fingerprints = {}
+        self._new_fingerprints = {}
+        self._staged = []  # Строки staging, еще не записанные на диск
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def begin(self, query):
+        """Начало обхода: загрузка отпечатков брендов и очистка staging для запроса."""
+        self.query = query
+        self.fingerprints = dict(self.conn.execute("SELECT brand_id, fingerprint FROM brands WHERE query = ?", (query,)))
+        self._new_fingerprints = {}
+        self._staged = []
+        with self.conn:
+            self.conn.execute("DELETE FROM staging WHERE query = ?", (query,))
+
+    def brand_unchanged(self, brand_id, fingerprint):
+        """Совпадает ли отпечаток бренда с прошлым снимком; новый отпечаток запоминается."""
+        self._new_fingerprints[brand_id] = fingerprint
+        return self.fingerprints.get(brand_id) == fingerprint
+
+    def keep_brand(self, brand_id):
+        """Бренд не получен: в новый снимок переносится его прошлый отпечаток (если он был)."""
+        if brand_id in self.fingerprints:
+            self._new_fingerprints[brand_id] = self.fingerprints[brand_id]
+        else:
+            self._new_fingerprints.pop(brand_id, None)
+
+    def brand_products(self, brand_id, limit, chunk_size=1000):
+        """Товары бренда из прошлого снимка порциями (не больше limit).
+
+        Строки бренда читаются целиком до первой порции: потребитель ждет между порциями,
+        и открытое чтение не должно держать базу, пока пишут другие запуски.
+        """
+        rows = self.conn.execute(
+            "SELECT data FROM products WHERE query = ? AND brand_id = ? ORDER BY rowid LIMIT ?",
+            (self.query, brand_id, limit),
+        ).fetchall()
+        for start in range(0, len(rows), chunk_size):
+            yield [Product(*json.loads(data)) for data, in rows[start:start + chunk_size]]
+
+    def stage(self, brand_id, products):
+        """Добавление товаров бренда в новый снимок; на диск - пачками по stage_batch_size."""
+        self._staged.extend((self.query, p.article, brand_id, json.dumps(astuple(p), ensure_ascii=False)) for p in products)
+        if len(self._staged) >= self.stage_batch_size:
+            self._flush_staged()
+
+    def _flush_staged(self):
+        if not self._staged:
+            return
+        staged, self._staged = self._staged, []
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO staging (query, article, brand_id, data) VALUES (?, ?, ?, ?)", staged)
+
+    def changes(self):
+        """Набор изменений относительно прошлого снимка: словари с полем change (new, removed, changed)."""
+        self._flush_staged()
+        rows = self.conn.execute(
+            "SELECT n.data, o.data FROM staging n LEFT JOIN products o ON o.query = n.query AND o.article = n.article "
+            "WHERE n.query = ? AND (o.data IS NULL OR o.data != n.data) "
+            "UNION ALL "
+            "SELECT NULL, o.data FROM products o LEFT JOIN staging n ON n.query = o.query AND n.article = o.article "
+            "WHERE o.query = ? AND n.article IS NULL",
+            (self.query, self.query),
+        )
+        for new_data, old_data in rows:
+            new = Product(*json.loads(new_data)) if new_data else None
+            old = Product(*json.loads(old_data)) if old_data else None
+            product = new or old
+            record = {
+                "change": "new" if old is None else "removed" if new is None else "changed",
+                "article": product.article,
+                "name": product.name,
+                "brand": product.brand,
+            }
+            for field in TRACKED_FIELDS:
+                record[f"old_{field}"] = getattr(old, field) if old else None
+                record[f"new_{field}"] = getattr(new, field) if new else None
+            yield record
+
+    def write_changes(self, path):
+        """Запись набора изменений в JSONL; возвращает число записей по видам изменений."""
+        counts = {"new": 0, "removed": 0, "changed": 0}
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.changes():
+                counts[record["change"]] += 1
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return counts
+
+    def commit(self):
+        """Замена прошлого снимка запроса новым."""
+        self._flush_staged()
+        with self.conn:
+            self.conn.execute("DELETE FROM products WHERE query = ?", (self.query,))
+            self.conn.execute(
+                "INSERT INTO products (query, article, brand_id, data) SELECT query, article, brand_id, data FROM staging WHERE query = ?",
+                (self.query,),
+            )
+            self.conn.execute("DELETE FROM staging WHERE query = ?", (self.query,))
+            self.conn.execute("DELETE FROM brands WHERE query = ?", (self.query,))
+            self.conn.executemany(
+                "INSERT INTO brands (query, brand_id, fingerprint) VALUES (?, ?, ?)",
+                [(self.query, brand_id, fingerprint) for brand_id, fingerprint in self._new_fingerprints.items()],
+            )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
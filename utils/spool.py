@@ -0,0 +1,83 @@
+import heapq
+import os
+import pickle
+import tempfile
+
+
+def field_key(field):
+    """Ключ сортировки товаров по полю: пустые значения (None) идут в конце."""
+    def key(product):
+        value = getattr(product, field)
+        return (value is None, value)
+    return key
+
+
+class ProductSpool:
+    """Буфер потока товаров с выгрузкой на диск.
+
+    Товары копятся в памяти порциями по chunk_size; заполненная порция
+    (отсортированная по key, если он задан) сбрасывается во временный файл.
+    При чтении порции сливаются через heapq.merge, поэтому в памяти одновременно
+    находится не больше одной порции и по одному товару из каждого файла.
+    """
+
+    def __init__(self, key=None, chunk_size=50000, tmp_dir=None):
+        self.key = key
+        self.chunk_size = chunk_size
+        self.tmp_dir = tmp_dir
+        self.count = 0
+        self._buffer = []
+        self._runs = []  # Пути временных файлов с порциями
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, products):
+        """Добавление порции товаров."""
+        self._buffer.extend(products)
+        self.count += len(products)
+        if len(self._buffer) >= self.chunk_size:
+            self._spill()
+
+    def _spill(self):
+        if self.key is not None:
+            self._buffer.sort(key=self.key)
+        fd, path = tempfile.mkstemp(prefix="wb_spool_", suffix=".pkl", dir=self.tmp_dir)
+        with os.fdopen(fd, "wb") as f:
+            for product in self._buffer:
+                pickle.dump(product, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._runs.append(path)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def __iter__(self):
+        """Чтение всех товаров: в порядке key или в порядке поступления."""
+        if self.key is not None:
+            self._buffer.sort(key=self.key)
+        if not self._runs:
+            return iter(self._buffer)
+        runs = [self._read_run(path) for path in self._runs] + [iter(self._buffer)]
+        if self.key is None:
+            return (product for run in runs for product in run)
+        return heapq.merge(*runs, key=self.key)
+
+    def close(self):
+        """Удаление временных файлов."""
+        for path in self._runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._runs = []
+        self._buffer = []
@@ -0,0 +1,228 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from operator import attrgetter
+from utils.records import PRODUCT_FIELD_NAMES
+
+# Файл хранилища товаров по умолчанию
+DEFAULT_STORE_FILE = "products.sqlite"
+
+# Поля товара, история которых хранится по запускам
+HISTORY_FIELDS = ["price_basic", "price_product", "price_total", "feedbacks", "rating"]
+
+_DATA_FIELDS = PRODUCT_FIELD_NAMES[1:]
+# Неизменившийся товар не перезаписывается (WHERE ... IS NOT ...): повторный запуск по тем же
+# товарам почти ничего не пишет в products, меняется только история
+_UPSERT_PRODUCT = (
+    f"INSERT INTO products ({', '.join(PRODUCT_FIELD_NAMES)}) VALUES ({', '.join('?' * len(PRODUCT_FIELD_NAMES))}) "
+    f"ON CONFLICT (article) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in _DATA_FIELDS)} "
+    f"WHERE ({', '.join(_DATA_FIELDS)}) IS NOT ({', '.join('excluded.' + name for name in _DATA_FIELDS)})"
+)
+_INSERT_OBSERVATION = (
+    f"INSERT OR REPLACE INTO observations (run_id, article, {', '.join(HISTORY_FIELDS)}) "
+    f"VALUES (?, ?, {', '.join('?' * len(HISTORY_FIELDS))})"
+)
+_product_values = attrgetter(*PRODUCT_FIELD_NAMES)
+_history_values = attrgetter("article", *HISTORY_FIELDS)
+
+
+class ProductStore:
+    """Хранилище товаров всех запусков в SQLite.
+
+    - products: последнее известное состояние каждого артикула (upsert), индексы
+      по бренду и продавцу;
+    - observations: цены, отзывы и рейтинг товара в каждом запуске - история цен,
+      по ней же определяются запросы товара и время первого и последнего появления;
+    - runs: запуски (запрос, регион, время), индексы по запросу и по времени.
+    Наблюдения хранятся без rowid с ключом (article, run_id): история одного артикула
+    лежит на диске рядом, поэтому точечный запрос читает несколько страниц
+    и при десятках миллионов строк. Товары копятся в памяти и пишутся пачками
+    по batch_size одной транзакцией: каждая транзакция заново пишет в журнал все
+    затронутые страницы индексов, поэтому крупные пачки в разы дешевле мелких.
+    Из цикла событий пишут асинхронные варианты методов (begin_run_async, add_async,
+    finish_run_async): пачка забирается в цикле, а пишется в отдельном потоке,
+    поэтому сбор и GUI не останавливаются на время транзакции.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_FILE, batch_size=50000, cache_mb=64):
+        self.batch_size = batch_size
+        # Запись идет из потоков asyncio.to_thread, поэтому соединение не привязано к потоку,
+        # а все записи идут под _write_lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._write_lock = threading.Lock()
+        self.conn.row_factory = sqlite3.Row
+        # WAL: чтение (CLI) не блокирует запись идущего сбора
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(f"PRAGMA cache_size = -{cache_mb * 1024}")
+        product_columns = ", ".join(
+            f"{name} {'INTEGER PRIMARY KEY' if name == 'article' else ''}" for name in PRODUCT_FIELD_NAMES
+        )
+        history_columns = ", ".join(f"{name} {'INTEGER' if name == 'feedbacks' else 'REAL'}" for name in HISTORY_FIELDS)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "id INTEGER PRIMARY KEY, query TEXT NOT NULL, dest INTEGER, started_at REAL NOT NULL, "
+                "finished_at REAL, products INTEGER NOT NULL DEFAULT 0)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS runs_query ON runs (query, started_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at)")
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS products ({product_columns})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS products_brand ON products (brand)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS products_supplier ON products (supplierId)")
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS observations (article INTEGER NOT NULL, run_id INTEGER NOT NULL, {history_columns}, "
+                "PRIMARY KEY (article, run_id)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS observations_run ON observations (run_id)")
+        self._pending = []  # (run_id, Product), еще не записанные на диск
+        self._counts = {}  # run_id -> число товаров запуска
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Запись
+
+    def begin_run(self, query, dest=None):
+        """Регистрация запуска; возвращает его id для add()."""
+        with self._write_lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (query, dest, started_at) VALUES (?, ?, ?)", (query, dest, time.time()))
+        self._counts[cursor.lastrowid] = 0
+        return cursor.lastrowid
+
+    def add(self, run_id, products):
+        """Добавление порции товаров запуска; запись на диск - пачками по batch_size."""
+        if self._buffer(run_id, products):
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных товаров одной транзакцией."""
+        self._write(self._take())
+
+    def finish_run(self, run_id):
+        """Отметка об успешном завершении запуска."""
+        self.flush()
+        self._finish(run_id, self._counts.pop(run_id, 0))
+
+    async def begin_run_async(self, query, dest=None):
+        return await asyncio.to_thread(self.begin_run, query, dest)
+
+    async def add_async(self, run_id, products):
+        """add() для цикла событий: полная пачка пишется в отдельном потоке."""
+        if self._buffer(run_id, products):
+            await self.flush_async()
+
+    async def flush_async(self):
+        # Пачка забирается в цикле событий, чтобы add_async других запусков не гонялись с записью
+        await asyncio.to_thread(self._write, self._take())
+
+    async def finish_run_async(self, run_id):
+        await self.flush_async()
+        await asyncio.to_thread(self._finish, run_id, self._counts.pop(run_id, 0))
+
+    def _buffer(self, run_id, products):
+        """Товары в очередь на запись; True - набралась пачка."""
+        self._pending.extend((run_id, product) for product in products)
+        self._counts[run_id] = self._counts.get(run_id, 0) + len(products)
+        return len(self._pending) >= self.batch_size
+
+    def _take(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _write(self, pending):
+        if not pending:
+            return
+        with self._write_lock, self.conn:
+            self.conn.executemany(_UPSERT_PRODUCT, (_product_values(product) for _, product in pending))
+            self.conn.executemany(_INSERT_OBSERVATION, ((run_id, *_history_values(product)) for run_id, product in pending))
+
+    def _finish(self, run_id, count):
+        with self._write_lock, self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ?, products = ? WHERE id = ?", (time.time(), count, run_id))
+
+    def close(self):
+        """Запись оставшихся товаров и закрытие; незавершенные запуски остаются без finished_at."""
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    # Чтение
+
+    def get(self, article):
+        """Последнее известное состояние товара (словарь с first_seen, last_seen и runs) или None."""
+        row = self.conn.execute("SELECT * FROM products WHERE article = ?", (article,)).fetchone()
+        if row is None:
+            return None
+        product = dict(row)
+        seen = self.conn.execute(
+            "SELECT MIN(r.started_at), MAX(r.started_at), COUNT(*) FROM observations o JOIN runs r ON r.id = o.run_id WHERE o.article = ?",
+            (article,),
+        ).fetchone()
+        product["first_seen"], product["last_seen"], product["runs"] = seen
+        return product
+
+    def history(self, article, since=None, until=None):
+        """История товара по запускам: время, запрос, регион и HISTORY_FIELDS.
+
+        since и until - границы времени запуска (Unix time).
+        """
+        sql = (
+            f"SELECT r.started_at, r.query, r.dest, {', '.join('o.' + name for name in HISTORY_FIELDS)} "
+            "FROM observations o JOIN runs r ON r.id = o.run_id WHERE o.article = ?"
+        )
+        params = [article]
+        if since is not None:
+            sql += " AND r.started_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND r.started_at < ?"
+            params.append(until)
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY o.run_id", params)]
+
+    def find(self, brand=None, supplier_id=None, query=None, limit=100):
+        """Товары по бренду, продавцу и (или) запросу, новые артикулы - первыми.
+
+        query - товары, найденные хотя бы одним запуском этого запроса.
+        """
+        sql = "SELECT p.* FROM products p"
+        conditions, params = [], []
+        if query is not None:
+            if brand is None and supplier_id is None:
+                # Только запрос: артикулы его запусков по индексу observations_run
+                conditions.append("p.article IN (SELECT o.article FROM observations o JOIN runs r ON r.id = o.run_id WHERE r.query = ?)")
+            else:
+                # С брендом или продавцом: товары берутся по их индексу, запрос проверяется по истории товара
+                conditions.append("EXISTS (SELECT 1 FROM observations o JOIN runs r ON r.id = o.run_id WHERE o.article = p.article AND r.query = ?)")
+            params.append(query)
+        if brand is not None:
+            conditions.append("p.brand = ?")
+            params.append(brand)
+        if supplier_id is not None:
+            conditions.append("p.supplierId = ?")
+            params.append(supplier_id)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY p.article DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def runs(self, query=None, limit=20):
+        """Последние запуски (все или по запросу)."""
+        if query is None:
+            rows = self.conn.execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute("SELECT * FROM runs WHERE query = ? ORDER BY started_at DESC LIMIT ?", (query, limit))
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """Число товаров, наблюдений и запусков."""
+        return {
+            table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("products", "observations", "runs")
+        }
@@ -0,0 +1,115 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Файл кэша продавцов по умолчанию
+DEFAULT_CACHE_FILE = "suppliers_cache.sqlite"
+
+
+class SupplierCache:
+    """Кэш данных продавцов: LRU в памяти поверх SQLite на диске.
+
+    Успешные ответы живут ttl секунд, неудачные (заглушки "Неизвестно") - negative_ttl,
+    чтобы временные ошибки не закреплялись навсегда. При path=None кэш только в памяти.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttl=7 * 24 * 3600, negative_ttl=6 * 3600, max_memory_items=50000, flush_every=500):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory_items = max_memory_items
+        self.flush_every = flush_every
+        self._memory = OrderedDict()  # supplier_id -> (expires_at, data)
+        self._pending = []  # Записи, еще не сброшенные на диск
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS suppliers ("
+                "supplier_id INTEGER PRIMARY KEY, data TEXT NOT NULL, found INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _remember(self, supplier_id, expires_at, data):
+        self._memory[supplier_id] = (expires_at, data)
+        self._memory.move_to_end(supplier_id)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, supplier_id):
+        """Данные продавца из кэша или None, если их нет или срок истек."""
+        now = time.time()
+        entry = self._memory.get(supplier_id)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(supplier_id)
+                return entry[1]
+            del self._memory[supplier_id]
+        if self.conn is None:
+            return None
+        row = self.conn.execute(
+            "SELECT data, expires_at FROM suppliers WHERE supplier_id = ? AND expires_at > ?",
+            (supplier_id, now),
+        ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        self._remember(supplier_id, row[1], data)
+        return data
+
+    def set(self, supplier_id, data, found=True):
+        """Сохранение данных продавца; found=False - заглушка после неудачного запроса."""
+        expires_at = time.time() + (self.ttl if found else self.negative_ttl)
+        self._remember(supplier_id, expires_at, data)
+        if self.conn is not None:
+            self._pending.append((supplier_id, json.dumps(data, ensure_ascii=False), int(found), expires_at))
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def warm(self, supplier_ids, chunk_size=500):
+        """Массовая загрузка актуальных записей с диска в память; возвращает найденные ID."""
+        found = set()
+        if self.conn is None:
+            return {supplier_id for supplier_id in supplier_ids if self.get(supplier_id) is not None}
+        now = time.time()
+        supplier_ids = list(supplier_ids)
+        for start in range(0, len(supplier_ids), chunk_size):
+            chunk = supplier_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT supplier_id, data, expires_at FROM suppliers WHERE expires_at > ? AND supplier_id IN ({placeholders})",
+                (now, *chunk),
+            )
+            for supplier_id, data, expires_at in rows:
+                self._remember(supplier_id, expires_at, json.loads(data))
+                found.add(supplier_id)
+        return found
+
+    def flush(self):
+        """Запись накопленных изменений на диск одной транзакцией."""
+        if self.conn is None or not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO suppliers (supplier_id, data, found, expires_at) VALUES (?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+
+    def purge_expired(self):
+        """Удаление просроченных записей с диска."""
+        if self.conn is not None:
+            with self.conn:
+                self.conn.execute("DELETE FROM suppliers WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
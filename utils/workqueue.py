@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import astuple
+from utils.records import Product
+
+# Файл очереди по умолчанию
+DEFAULT_QUEUE_FILE = "work_queue.sqlite"
+
+
+class WorkQueue:
+    """Очередь блоков работы в SQLite для координатора и воркеров.
+
+    Координатор создает задание (запрос) и блоки - бренды с квотой и числом страниц.
+    Воркеры атомарно забирают блоки (claim), а результаты пишут в ту же базу
+    одной транзакцией с отметкой о выполнении. Блок, взятый воркером, который
+    не отчитался за lease секунд, снова становится доступен; после max_attempts
+    неудачных попыток блок помечается failed.
+    Файл может лежать на общем диске, доступном воркерам на других машинах.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_FILE, lease=300, max_attempts=3, timeout=60):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # Транзакции открываются явно, чтобы захват блока был атомарным между процессами.
+        # Воркер вызывает методы из потоков asyncio.to_thread, поэтому соединение
+        # не привязано к потоку, а обращения к нему идут под _lock
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, query TEXT NOT NULL, max_products INTEGER NOT NULL, status TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS units ("
+                "id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, brand_id INTEGER NOT NULL, quota INTEGER NOT NULL, pages INTEGER, "
+                "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed_at REAL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS units_status ON units (status, job_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                "job_id INTEGER NOT NULL, article INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, article))"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция с блокировкой на запись с самого начала (BEGIN IMMEDIATE)."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def create_job(self, query, max_products, units):
+        """Новое задание с блоками units = [(brand_id, quota, pages)]; возвращает ID задания."""
+        with self._transaction() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (query, max_products, status) VALUES (?, ?, 'open')", (query, max_products)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO units (job_id, brand_id, quota, pages) VALUES (?, ?, ?, ?)",
+                [(job_id, brand_id, quota, pages) for brand_id, quota, pages in units],
+            )
+        return job_id
+
+    def expire(self):
+        """Блоки с истекшей арендой и исчерпанными попытками помечаются failed."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET status = 'failed', error = 'Истек срок аренды блока' "
+                "WHERE status = 'claimed' AND claimed_at < ? AND attempts >= ?",
+                (time.time() - self.lease, self.max_attempts),
+            )
+
+    def claim(self, worker):
+        """Захват очередного блока открытого задания: (unit_id, query, brand_id, quota, pages) или None."""
+        self.expire()
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT units.id, jobs.query, units.brand_id, units.quota, units.pages FROM units "
+                "JOIN jobs ON jobs.id = units.job_id WHERE jobs.status = 'open' AND units.attempts < ? "
+                "AND (units.status = 'pending' OR (units.status = 'claimed' AND units.claimed_at < ?)) "
+                "ORDER BY units.id LIMIT 1",
+                (self.max_attempts, now - self.lease),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE units SET status = 'claimed', worker = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (worker, now, row[0]),
+                )
+        return row
+
+    def complete(self, unit_id, products):
+        """Сохранение товаров блока и отметка о выполнении."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO products (job_id, article, data) "
+                "SELECT job_id, ?, ? FROM units WHERE id = ?",
+                [(p.article, json.dumps(astuple(p), ensure_ascii=False), unit_id) for p in products],
+            )
+            conn.execute("UPDATE units SET status = 'done', error = NULL WHERE id = ?", (unit_id,))
+
+    def fail(self, unit_id, error):
+        """Возврат блока в очередь после ошибки (или failed, если попытки исчерпаны)."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? WHERE id = ?",
+                (self.max_attempts, str(error), unit_id),
+            )
+
+    def progress(self, job_id):
+        """Число блоков задания по статусам."""
+        counts = {"pending": 0, "claimed": 0, "done": 0, "failed": 0}
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM units WHERE job_id = ? GROUP BY status", (job_id,)).fetchall()
+        counts.update(dict(rows))
+        return counts
+
+    def has_open_jobs(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM jobs WHERE status = 'open' LIMIT 1").fetchone() is not None
+
+    def close_job(self, job_id):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'closed' WHERE id = ?", (job_id,))
+
+    def products(self, job_id, limit=-1, chunk_size=1000):
+        """Товары задания порциями в порядке поступления (не больше limit)."""
+        cursor = self.conn.execute(
+            "SELECT data FROM products WHERE job_id = ? ORDER BY rowid LIMIT ?", (job_id, limit)
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [Product(*json.loads(data)) for data, in rows]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
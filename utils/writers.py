@@ -0,0 +1,216 @@
+import csv
+import gzip
+import json
+from utils.records import ProductBatch, product_url
+
+# Расширения файлов и соответствующие форматы (длинные расширения проверяются первыми)
+FORMAT_EXTENSIONS = [
+    (".csv.gz", "csv"),
+    (".jsonl", "jsonl"),
+    (".parquet", "parquet"),
+    (".xlsx", "xlsx"),
+]
+FORMATS = ("xlsx", "parquet", "csv", "jsonl")
+
+# Плоская схема товара для колоночных форматов: (поле, тип)
+PRODUCT_FIELDS = [
+    ("article", "int64"),
+    ("name", "string"),
+    ("brand", "string"),
+    ("url", "string"),
+    ("price_basic", "float64"),
+    ("price_product", "float64"),
+    ("price_total", "float64"),
+    ("feedbacks", "int64"),
+    ("rating", "float64"),
+    ("supplier", "string"),
+    ("supplierId", "int64"),
+    ("supplierRating", "float64"),
+]
+
+SUPPLIER_FIELDS = [
+    ("supplierId", "int64"),
+    ("supplierName", "string"),
+    ("supplierFullName", "string"),
+    ("inn", "string"),
+    ("ogrn", "string"),
+    ("ogrnip", "string"),
+    ("legalAddress", "string"),
+    ("trademark", "string"),
+    ("kpp", "string"),
+    ("taxpayerCode", "string"),
+    ("unp", "string"),
+    ("bin", "string"),
+    ("unn", "string"),
+    ("supplierUrl", "string"),
+]
+
+
+def detect_format(output_file):
+    """Определение формата по расширению файла."""
+    lower = output_file.lower()
+    for extension, fmt in FORMAT_EXTENSIONS:
+        if lower.endswith(extension):
+            return fmt
+    raise ValueError(f"Не удалось определить формат по имени файла {output_file}; поддерживаются: {', '.join(e for e, _ in FORMAT_EXTENSIONS)}")
+
+
+def sibling_path(output_file, name):
+    """Путь соседнего файла того же формата: (products.parquet, brands) -> products.brands.parquet."""
+    lower = output_file.lower()
+    for extension, _ in FORMAT_EXTENSIONS:
+        if lower.endswith(extension):
+            return output_file[:-len(extension)] + f".{name}" + output_file[-len(extension):]
+    return output_file + f".{name}"
+
+
+def suppliers_path(output_file):
+    """Путь файла продавцов рядом с файлом товаров: products.parquet -> products.suppliers.parquet."""
+    return sibling_path(output_file, "suppliers")
+
+
+def product_record(product):
+    """Плоская запись товара (Product) по схеме PRODUCT_FIELDS."""
+    return {field: getattr(product, field) for field, _ in PRODUCT_FIELDS}
+
+
+def supplier_record(supplier):
+    """Запись продавца по схеме SUPPLIER_FIELDS; строковые поля приводятся к str."""
+    record = {"supplierId": supplier["supplierId"]}
+    for field, _ in SUPPLIER_FIELDS[1:]:
+        value = supplier.get(field)
+        record[field] = None if value is None else str(value)
+    return record
+
+
+class JsonlWriter:
+    """Построчный JSON: одна запись товара на строку, дозапись порциями."""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.file = open(output_file, "w", encoding="utf-8")
+        self.rows = 0
+
+    def write(self, products):
+        self.file.writelines(json.dumps(product_record(p), ensure_ascii=False) + "\n" for p in products)
+        self.rows += len(products)
+
+    def close(self, supplier_data=()):
+        self.file.close()
+        with open(suppliers_path(self.output_file), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(supplier_record(s), ensure_ascii=False) + "\n" for s in supplier_data)
+
+
+class CsvGzWriter:
+    """CSV со сжатием gzip, дозапись порциями."""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.file = gzip.open(output_file, "wt", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=[field for field, _ in PRODUCT_FIELDS])
+        self.writer.writeheader()
+        self.rows = 0
+
+    def write(self, products):
+        self.writer.writerows(product_record(p) for p in products)
+        self.rows += len(products)
+
+    def close(self, supplier_data=()):
+        self.file.close()
+        with gzip.open(suppliers_path(self.output_file), "wt", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[field for field, _ in SUPPLIER_FIELDS])
+            writer.writeheader()
+            writer.writerows(supplier_record(s) for s in supplier_data)
+
+
+def _pyarrow():
+    """Модули pyarrow и pyarrow.parquet (необязательная зависимость)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Для записи в Parquet установите пакет pyarrow")
+    return pa, pq
+
+
+def _arrow_schema(pa, fields):
+    """Схема Arrow по схеме [(поле, тип)] как PRODUCT_FIELDS."""
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string()}
+    return pa.schema([(field, types[kind]) for field, kind in fields])
+
+
+class ParquetWriter:
+    """Parquet с типизированной схемой; каждая порция пишется отдельной группой строк.
+
+    Требует pyarrow (необязательная зависимость).
+    """
+
+    def __init__(self, output_file):
+        self.pa, pq = _pyarrow()
+        self.output_file = output_file
+        self.schema = _arrow_schema(self.pa, PRODUCT_FIELDS)
+        self.writer = pq.ParquetWriter(output_file, self.schema, compression="snappy")
+        self.rows = 0
+
+    def write(self, products):
+        """Запись порции: списка Product или готового ProductBatch."""
+        batch = products if isinstance(products, ProductBatch) else ProductBatch.from_products(products)
+        if not len(batch):
+            return
+        columns = {}
+        for field in self.schema:
+            if field.name == "url":
+                columns["url"] = [product_url(article) for article in batch.columns["article"]]
+            else:
+                columns[field.name] = batch.column(field.name)
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+        self.rows += len(batch)
+
+    def close(self, supplier_data=()):
+        self.writer.close()
+        rows = (tuple(supplier_record(s).values()) for s in supplier_data)
+        write_table(suppliers_path(self.output_file), "parquet", SUPPLIER_FIELDS, rows)
+
+
+def open_writer(output_file, fmt=None, supplier_data=()):
+    """Открытие писателя нужного формата.
+
+    У всех писателей есть write(products) для дозаписи порции и close(supplier_data).
+    Колоночные форматы пишут продавцов отдельным файлом рядом (см. suppliers_path),
+    а Excel объединяет их с товарами в строке, поэтому продавцы нужны ему сразу.
+    """
+    fmt = fmt or detect_format(output_file)
+    if fmt == "xlsx":
+        from utils.excel_creator import ExcelStreamWriter
+        return ExcelStreamWriter(output_file, supplier_data)
+    if fmt == "parquet":
+        return ParquetWriter(output_file)
+    if fmt == "csv":
+        return CsvGzWriter(output_file)
+    if fmt == "jsonl":
+        return JsonlWriter(output_file)
+    raise ValueError(f"Неизвестный формат вывода: {fmt}")
+
+
+def write_table(path, fmt, fields, rows):
+    """Запись отдельной таблицы в файл формата fmt (кроме xlsx).
+
+    fields - схема [(поле, тип)] как PRODUCT_FIELDS, rows - кортежи значений в порядке полей.
+    """
+    names = [field for field, _ in fields]
+    if fmt == "jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n" for row in rows)
+    elif fmt == "csv":
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(rows)
+    elif fmt == "parquet":
+        pa, pq = _pyarrow()
+        schema = _arrow_schema(pa, fields)
+        rows = list(rows)
+        columns = {name: [row[index] for row in rows] for index, name in enumerate(names)}
+        pq.write_table(pa.Table.from_pydict(columns, schema=schema), path, compression="snappy")
+    else:
+        raise ValueError(f"Неизвестный формат вывода: {fmt}")